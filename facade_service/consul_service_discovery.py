@@ -0,0 +1,116 @@
+import logging
+import random
+import threading
+import time
+from itertools import count
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class ServiceInstance:
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.outstanding = 0
+
+    @property
+    def url(self):
+        return f"http://{self.address}:{self.port}"
+
+    def __repr__(self):
+        return f"ServiceInstance({self.url}, outstanding={self.outstanding})"
+
+
+class RoundRobinSelector:
+    def __init__(self):
+        self.counter = count()
+
+    def select(self, instances):
+        return instances[next(self.counter) % len(instances)]
+
+
+class LeastOutstandingRequestsSelector:
+    def select(self, instances):
+        return min(instances, key=lambda instance: instance.outstanding)
+
+
+class PowerOfTwoChoicesSelector:
+    def select(self, instances):
+        if len(instances) == 1:
+            return instances[0]
+        first, second = random.sample(instances, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+
+SELECTORS = {
+    'round_robin': RoundRobinSelector,
+    'least_outstanding_requests': LeastOutstandingRequestsSelector,
+    'power_of_two_choices': PowerOfTwoChoicesSelector
+}
+
+
+class ConsulServiceDiscovery:
+    """Cached list of healthy instances of a service, kept fresh by Consul blocking queries.
+
+    A background thread long-polls the health endpoint (index-based blocking query), so picking
+    an instance per request is an in-memory operation. Outstanding requests are tracked per instance
+    for the load-aware selectors.
+    """
+
+    def __init__(self, consul, service_name, selector='round_robin', wait='55s', retry_interval=5):
+        if selector not in SELECTORS:
+            raise ValueError(f"Invalid load balancing policy: {selector}")
+        self.consul = consul
+        self.service_name = service_name
+        self.selector = SELECTORS[selector]()
+        self.wait = wait
+        self.retry_interval = retry_interval
+
+        self.lock = threading.Lock()
+        self.instances = []
+        self.index = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.refresh(wait=None)  # Fill the cache before the first request
+        self.running = True
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def watch(self):
+        while self.running:
+            try:
+                self.refresh(wait=self.wait)
+            except Exception as e:
+                logger.error(f"Error watching {self.service_name} in Consul: {e}")
+                self.index = None
+                time.sleep(self.retry_interval)
+
+    def refresh(self, wait):
+        index, addresses = self.consul.watch_healthy_service(self.service_name, index=self.index, wait=wait)
+        with self.lock:
+            current = {(instance.address, instance.port): instance for instance in self.instances}
+            # Keep existing instances so their outstanding request counts survive the refresh
+            self.instances = [current.get(address) or ServiceInstance(*address) for address in addresses]
+        if index != self.index:
+            logger.info(f"{self.service_name} - from CONSUL - {self.instances}")
+        self.index = index
+
+    def acquire(self):
+        """Pick an instance and count a request as outstanding on it; release() it when done."""
+        with self.lock:
+            if not self.instances:
+                raise LookupError(f"No healthy instances of {self.service_name}")
+            instance = self.selector.select(self.instances)
+            instance.outstanding += 1
+            return instance
+
+    def release(self, instance):
+        with self.lock:
+            instance.outstanding -= 1
@@ -28,6 +28,17 @@ class ConsulServiceRegistry:
                 result.append((service['Address'], service['Port']))
         return result
 
+    def watch_healthy_service(self, service_name, index=None, wait=None):
+        """Blocking query for instances of the service passing their health checks.
+
+        Returns (index, [(address, port)]); pass the index back to wait up to `wait` for the next change.
+        """
+        index, nodes = self.consul.health.service(service_name, index=index, wait=wait, passing=True)
+        return index, [
+            (node['Service']['Address'] or node['Node']['Address'], node['Service']['Port'])
+            for node in nodes
+        ]
+
     def get_config(self, name):
         settings = self.consul.kv.get(name)
         if settings and settings[1]:
@@ -1,15 +1,21 @@
+import asyncio
 import logging
 import os
 from socket import gethostname, gethostbyname
-from fastapi import FastAPI, Query, Request
+from fastapi import FastAPI, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
 from consul_service_registry import ConsulServiceRegistry
+from facade_live_updates import LIVE_UPDATE_TABLES
 from facade_service import FacadeService
+from service_metrics import instrument_app
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument_app(app)
 
 consul = ConsulServiceRegistry(consul_host="consul-server", consul_port=8500)
 facade_service = FacadeService(consul=consul)
@@ -17,12 +23,61 @@ facade_service = FacadeService(consul=consul)
 
 @app.get("/precomputed_report_data/{report_name}")
 async def get_precomputed_report_data(report_name: str, request: Request):
-    return facade_service.get_precomputed_report_data(report_name, dict(request.query_params))
+    response = await facade_service.get_precomputed_report_data(
+        report_name, dict(request.query_params), if_none_match=request.headers.get("If-None-Match"))
+    headers = {"ETag": response.headers["ETag"]} if "ETag" in response.headers else None
+    if response.status_code == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(content=response.content, media_type="application/json", headers=headers)
+
+
+@app.get("/precomputed_report_data/{report_name}/history")
+async def get_precomputed_report_history(report_name: str, request: Request):
+    response, body, close = await facade_service.open_precomputed_report_history(
+        report_name, dict(request.query_params))
+    if body is None:
+        return Response(content=response.content, status_code=response.status_code,
+                        media_type=response.headers.get("Content-Type"))
+    return StreamingResponse(body, media_type="application/x-ndjson", background=BackgroundTask(close))
 
 
 @app.get("/live_data/{report_name}")
 async def get_live_data(report_name: str, request: Request):
-    return facade_service.get_live_data(report_name, dict(request.query_params))
+    return await facade_service.get_live_data(report_name, dict(request.query_params))
+
+
+async def send_live_updates(websocket: WebSocket, subscription):
+    while True:
+        for message in await subscription.next_batch():
+            await websocket.send_text(message)
+
+
+@app.websocket("/live_data/stream")
+async def stream_live_data(websocket: WebSocket, symbols: str, tables: str = ",".join(LIVE_UPDATE_TABLES)):
+    """Push quote and closed-minute tradeBin1m updates of the given symbols (comma separated) as JSON messages."""
+    tables = [table for table in tables.split(",") if table in LIVE_UPDATE_TABLES]
+    await websocket.accept()
+    subscription = facade_service.live_updates.subscribe(symbols.split(","), tables)
+    sender = asyncio.create_task(send_live_updates(websocket, subscription))
+    try:
+        # Clients do not send anything; receiving only detects the disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        facade_service.live_updates.unsubscribe(subscription)
+
+
+@app.on_event("startup")
+async def startup():
+    facade_service.live_updates.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await facade_service.aclose()
 
 
 @app.get("/health")
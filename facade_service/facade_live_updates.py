@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+from collections import deque
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+LIVE_UPDATE_TABLES = ('quote', 'tradeBin1m')
+
+
+class LiveUpdateSubscription:
+    """Bounded buffer of encoded updates for one websocket client.
+
+    A client that reads slower than updates arrive loses the oldest buffered updates (they are
+    superseded by newer ones); the number of dropped updates is sent to it before the next batch.
+    """
+
+    def __init__(self, symbols, tables, buffer_size=1000):
+        self.symbols = set(symbols)
+        self.tables = set(tables)
+        self.buffer = deque(maxlen=buffer_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.unreported_drops = 0
+
+    def offer(self, message):
+        """Buffer the message; True if the oldest buffered one was dropped for it."""
+        dropped = len(self.buffer) == self.buffer.maxlen
+        if dropped:
+            self.dropped += 1
+            self.unreported_drops += 1
+        self.buffer.append(message)
+        self.ready.set()
+        return dropped
+
+    async def next_batch(self):
+        """All buffered updates, oldest first; waits until there is at least one."""
+        await self.ready.wait()
+        self.ready.clear()
+        batch = list(self.buffer)
+        self.buffer.clear()
+        if self.unreported_drops:
+            batch.insert(0, json.dumps({'dropped': self.unreported_drops}))
+            self.unreported_drops = 0
+        return batch
+
+
+class LiveUpdateHub:
+    """Fans out the live update feed (one Hazelcast topic listener per facade process) to websocket clients.
+
+    Every update is decoded and re-encoded once, then the same string is offered to every subscription of
+    its table and symbol. The latest update per (table, symbol) is kept, so new clients start with it.
+    """
+
+    def __init__(self, hazelcast_client, topic_name, buffer_size=1000):
+        self.topic = hazelcast_client.get_topic(topic_name).blocking()
+        self.buffer_size = buffer_size
+        self.loop = None
+        self.listener_id = None
+
+        self.subscriptions = {}  # (table, symbol) -> set of subscriptions
+        self.latest = {}  # (table, symbol) -> encoded update
+        self.clients = 0
+        self.received = 0
+        self.dropped = 0
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.listener_id = self.topic.add_listener(self.message_listener)
+
+    def message_listener(self, message):
+        # Called on a Hazelcast client thread; subscriptions are only touched on the event loop
+        self.loop.call_soon_threadsafe(self.dispatch, message.message)
+
+    def dispatch(self, raw_message):
+        try:
+            message = json.loads(raw_message)
+        except ValueError as e:
+            logger.error(f"Error decoding live update: {e}")
+            return
+        table = message.get('table')
+        for record in message.get('data', []):
+            key = (table, record.get('symbol'))
+            encoded = json.dumps({'table': table, **record})
+            self.latest[key] = encoded
+            self.received += 1
+            for subscription in self.subscriptions.get(key, ()):
+                if subscription.offer(encoded):
+                    self.dropped += 1
+
+    def subscribe(self, symbols, tables=LIVE_UPDATE_TABLES):
+        subscription = LiveUpdateSubscription(symbols, tables, self.buffer_size)
+        self.clients += 1
+        for table in subscription.tables:
+            for symbol in subscription.symbols:
+                self.subscriptions.setdefault((table, symbol), set()).add(subscription)
+                if (table, symbol) in self.latest:
+                    subscription.offer(self.latest[(table, symbol)])
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.clients -= 1
+        for table in subscription.tables:
+            for symbol in subscription.symbols:
+                subscribers = self.subscriptions.get((table, symbol))
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self.subscriptions[(table, symbol)]
+
+    def stats(self):
+        return {'clients': self.clients, 'received': self.received, 'dropped': self.dropped}
+
+    def close(self):
+        if self.listener_id is not None:
+            self.topic.remove_listener(self.listener_id)
@@ -0,0 +1,56 @@
+"""Load test of the facade live update stream: delivery lag and drops at 1, 100 and 1000 websocket clients.
+
+Every client subscribes to the same symbols for --duration seconds; the lag of an update is the time from
+its exchange timestamp to its arrival at the client.
+
+Example:
+    python facade_live_updates_load_test.py --url "ws://localhost:8000/live_data/stream?symbols=XBTUSD,ETHUSD"
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import websockets
+
+
+async def client_loop(url, deadline, lags, counters):
+    async with websockets.connect(url, max_queue=None) as websocket:
+        while True:
+            try:
+                message = json.loads(await asyncio.wait_for(websocket.recv(), deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return
+            if 'dropped' in message:
+                counters['dropped'] += message['dropped']
+                continue
+            counters['received'] += 1
+            lags.append(time.time() - message['timestamp'] / 1000)
+
+
+async def run(url, concurrency, duration):
+    lags, counters = [], {'received': 0, 'dropped': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(client_loop(url, deadline, lags, counters) for _ in range(concurrency)))
+    return lags, counters
+
+
+def percentile(ordered, point):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] if ordered else 0.0
+
+
+def main(args):
+    print(f"{'clients':>8} {'updates':>10} {'dropped':>8} {'lag p50 ms':>11} {'lag p99 ms':>11}")
+    for concurrency in args.concurrency:
+        lags, counters = asyncio.run(run(args.url, concurrency, args.duration))
+        lags.sort()
+        print(f"{concurrency:>8} {counters['received']:>10} {counters['dropped']:>8} "
+              f"{percentile(lags, 50) * 1000:>11.1f} {percentile(lags, 99) * 1000:>11.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default="ws://localhost:8000/live_data/stream?symbols=XBTUSD")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--duration', type=float, default=30)
+    main(parser.parse_args())
@@ -0,0 +1,58 @@
+"""Load test of the facade: requests/sec and latency percentiles at 1, 100 and 1000 concurrent clients.
+
+Every client sends requests back to back over its own keep-alive connection for --duration seconds.
+
+Example:
+    python facade_load_test.py --url "http://localhost:8000/live_data/sum_trades_last_n_minutes?symbol=XBTUSD&n_minutes=5"
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+async def client_loop(http_client, url, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        try:
+            response = await http_client.get(url)
+            response.raise_for_status()
+            latencies.append(time.monotonic() - start)
+        except httpx.HTTPError:
+            errors.append(time.monotonic() - start)
+
+
+async def run(url, concurrency, duration, timeout):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as http_client:
+        deadline = time.monotonic() + duration
+        start = time.monotonic()
+        await asyncio.gather(*(client_loop(http_client, url, deadline, latencies, errors) for _ in range(concurrency)))
+        elapsed = time.monotonic() - start
+    return latencies, errors, elapsed
+
+
+def percentile(ordered, point):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] if ordered else 0.0
+
+
+async def main(args):
+    print(f"{args.url}, {args.duration} s per level, latency in ms")
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'req/sec':>9} {'p50':>8} {'p99':>8} {'max':>8}")
+    for concurrency in args.concurrency:
+        latencies, errors, elapsed = await run(args.url, concurrency, args.duration, args.timeout)
+        ordered = sorted(latencies)
+        print(f"{concurrency:>8} {len(latencies):>9} {len(errors):>7} {len(latencies) / elapsed:>9.0f} "
+              f"{percentile(ordered, 50) * 1000:>8.1f} {percentile(ordered, 99) * 1000:>8.1f} "
+              f"{(ordered[-1] if ordered else 0) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default="http://localhost:8000/live_data/get_latest_prices?symbol=XBTUSD")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--timeout', type=float, default=60)
+    asyncio.run(main(parser.parse_args()))
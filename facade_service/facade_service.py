@@ -1,35 +1,109 @@
-import json
+import asyncio
 import logging
-import random
 import threading
 import time
 import uuid
 
 import hazelcast
-import requests
+import httpx
+from prometheus_client import Counter, Histogram
+
+import live_data_wire_format
+from consul_service_discovery import ConsulServiceDiscovery
+from facade_live_updates import LiveUpdateHub
+from service_metrics import DURATION_BUCKETS, CallbackMetric
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+LIVE_DATA_TYPES = ('sum_trades_last_n_minutes', 'top_n_cryptos_last_hour', 'get_latest_prices')
+LIVE_DATA_REPLY_DURATION = Histogram('live_data_reply_duration_seconds',
+                                     "Time from queueing a live data request to receiving its reply", ['type'],
+                                     buckets=DURATION_BUCKETS)
+LIVE_DATA_FAILURES = Counter('live_data_request_failures_total', "Live data requests without a reply",
+                             ['type', 'reason'])
+
+
+def set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def set_future_exception(future, exception):
+    if not future.done():
+        future.set_exception(exception)
+
+
+def wrap_hazelcast_future(hazelcast_future):
+    """Await a hazelcast-client Future from asyncio code without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def on_done(completed):
+        try:
+            loop.call_soon_threadsafe(set_future_result, future, completed.result())
+        except Exception as e:
+            loop.call_soon_threadsafe(set_future_exception, future, e)
+
+    hazelcast_future.add_done_callback(on_done)
+    return future
+
+
+class LiveDataReplyDispatcher:
+    """One long-lived reply topic per facade instance, shared by all live data requests.
+
+    Every request carries a correlation ID; replies are matched to the waiting asyncio future by that ID.
+    Replies with unknown IDs (e.g. arriving after a timeout) are counted and dropped.
+    """
 
-class DataReceiver:
     def __init__(self, hazelcast_client):
         self.client = hazelcast_client
-        self.received_message = None
-        self.message_event = threading.Event()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.unknown_replies = 0
+        self.timed_out_requests = 0
 
         self.receive_topic_name = f"get_live_data_topic_{uuid.uuid4()}"
         self.topic = self.client.get_topic(self.receive_topic_name).blocking()
-        self.topic.add_listener(self.message_listener)
+        self.listener_id = self.topic.add_listener(self.message_listener)
+
+    def register(self):
+        correlation_id = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            self.pending[correlation_id] = (loop, future)
+        return correlation_id, future
+
+    def unregister(self, correlation_id):
+        with self.lock:
+            self.pending.pop(correlation_id, None)
 
     def message_listener(self, message):
-        self.received_message = json.loads(message.message)
-        self.message_event.set()
+        # Called on a Hazelcast client thread
+        reply = live_data_wire_format.decode(message.message)
+        with self.lock:
+            waiting = self.pending.pop(reply.get('correlation_id'), None)
+        if waiting is None:
+            self.unknown_replies += 1
+            logger.warning(f"Dropping reply with unknown correlation ID ({self.unknown_replies} so far)")
+            return
+        loop, future = waiting
+        loop.call_soon_threadsafe(set_future_result, future, reply.get('data'))
+
+    async def wait_for_reply(self, correlation_id, future, timeout=60):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out_requests += 1
+            return None
+        finally:
+            self.unregister(correlation_id)
 
-    def wait_for_message(self, timeout=60):
-        self.message_event.wait(timeout)
-        return self.received_message
+    def close(self):
+        self.topic.remove_listener(self.listener_id)
+        self.topic.destroy()
 
 
 class FacadeService:
@@ -40,36 +114,130 @@ class FacadeService:
             cluster_members=[consul.get_config("hazelcast/cluster_host")],
             cluster_name=consul.get_config("hazelcast/cluster_name")
         )
-        self.distributed_queue = self.client.get_queue(consul.get_config("hazelcast/live_data_queue")).blocking()
-
-    @property
-    def get_precomputed_report_data_service(self):
-        url = [f"http://{i}:{j}" for i, j in self.consul.get_service_addresses("precomputed_report_data_retrieve_service")]
-        logger.info(f"precomputed_report_data_retrieve_service - from CONSUL - {url}")
-        return random.choice(url)
-
-    def get_precomputed_report_data(self, report_name: str, params: dict):
-        precomputed_report_service_url = self.get_precomputed_report_data_service
-        response = requests.get(f"{precomputed_report_service_url}/{report_name}", params=params)
-        response.raise_for_status()
-        logger.debug("Get precomputed report data successful!")
-        logger.debug(response.json())
-        return response.json()
+        # Non-blocking proxy: operations return futures instead of blocking the event loop
+        self.distributed_queue = self.client.get_queue(consul.get_config("hazelcast/live_data_queue"))
+        self.encode = live_data_wire_format.encoder(consul.get_config("live_data/wire_format") or 'msgpack')
+        self.reply_dispatcher = LiveDataReplyDispatcher(self.client)
+        self.live_updates = LiveUpdateHub(
+            self.client, consul.get_config("hazelcast/live_updates_topic") or "live_updates",
+            buffer_size=int(consul.get_config("facade/live_updates_buffer_size") or 1000)
+        )
 
-    def get_live_data(self, report_name: str, params: dict):
-        data_receiver = DataReceiver(self.client)
+        CallbackMetric('live_data_unknown_replies_total', "Replies received after their request timed out",
+                       lambda: self.reply_dispatcher.unknown_replies, type='counter')
+        CallbackMetric('live_update_clients', "Connected live update websocket clients",
+                       lambda: self.live_updates.clients)
+        CallbackMetric('live_updates_received_total', "Updates received from the live update feed",
+                       lambda: self.live_updates.received, type='counter')
+        CallbackMetric('live_updates_dropped_total', "Updates dropped from the buffers of slow websocket clients",
+                       lambda: self.live_updates.dropped, type='counter')
+
+        self.precomputed_report_data_service_discovery = ConsulServiceDiscovery(
+            consul, "precomputed_report_data_retrieve_service",
+            selector=consul.get_config("facade/load_balancing_policy") or 'round_robin'
+        )
+        self.precomputed_report_data_service_discovery.start()
+
+        # Pooled keep-alive HTTP client for the precomputed report data service
+        self.http_client = httpx.AsyncClient(
+            timeout=float(consul.get_config("facade/http_timeout") or 30),
+            limits=httpx.Limits(
+                max_connections=int(consul.get_config("facade/http_max_connections") or 100),
+                max_keepalive_connections=int(consul.get_config("facade/http_max_keepalive_connections") or 20)
+            )
+        )
 
+    async def get_precomputed_report_data(self, report_name: str, params: dict, if_none_match=None):
+        """Raw response of the precomputed report data service; the body is passed through without re-parsing."""
+        headers = {"If-None-Match": if_none_match} if if_none_match else None
+        instance = self.precomputed_report_data_service_discovery.acquire()
+        try:
+            response = await self.http_client.get(f"{instance.url}/{report_name}", params=params, headers=headers)
+        finally:
+            self.precomputed_report_data_service_discovery.release(instance)
+        if response.status_code != 304:
+            response.raise_for_status()
+        return response
+
+    async def open_precomputed_report_history(self, report_name: str, params: dict):
+        """Open the NDJSON history stream of a report on the precomputed report data service.
+
+        Returns (response, body, close). An error response is read in full and returned with no body, so its
+        status and error can be passed on before anything is sent to the client. Otherwise body yields the raw
+        chunks and close() (safe to call twice) releases the connection if the body is not read to the end.
+        """
+        instance = self.precomputed_report_data_service_discovery.acquire()
+        try:
+            response = await self.http_client.send(
+                self.http_client.build_request("GET", f"{instance.url}/{report_name}/history", params=params),
+                stream=True)
+        except BaseException:
+            self.precomputed_report_data_service_discovery.release(instance)
+            raise
+
+        closed = False
+
+        async def close():
+            nonlocal closed
+            if not closed:
+                closed = True
+                await response.aclose()
+                self.precomputed_report_data_service_discovery.release(instance)
+
+        if response.is_error:
+            try:
+                await response.aread()
+            finally:
+                await close()
+            return response, None, close
+
+        async def body():
+            try:
+                async for chunk in response.aiter_raw():
+                    yield chunk
+            finally:
+                await close()
+
+        return response, body(), close
+
+    async def get_live_data(self, report_name: str, params: dict):
+        correlation_id, future = self.reply_dispatcher.register()
+        request_type = report_name if report_name in LIVE_DATA_TYPES else 'other'
+
+        # Query parameters first, so they cannot override the reply routing fields
         data = {
-            'topic': data_receiver.receive_topic_name,
+            **params,
+            'topic': self.reply_dispatcher.receive_topic_name,
+            'correlation_id': correlation_id,
             'type': report_name,
-            **params
+            'sent_at': time.time()  # Queue wait of the live data retrieve service
         }
-        self.distributed_queue.offer(json.dumps(data), timeout=5)
-
-        return data_receiver.wait_for_message()
+        start = time.perf_counter()
+        try:
+            offered = await wrap_hazelcast_future(self.distributed_queue.offer(self.encode(data), timeout=5))
+        except BaseException:
+            self.reply_dispatcher.unregister(correlation_id)
+            raise
+        if not offered:
+            self.reply_dispatcher.unregister(correlation_id)
+            LIVE_DATA_FAILURES.labels(request_type, 'queue_full').inc()
+            return {'error': "Live data queue is full, try again later"}
+
+        result = await self.reply_dispatcher.wait_for_reply(correlation_id, future)
+        if result is None:
+            LIVE_DATA_FAILURES.labels(request_type, 'timeout').inc()
+        else:
+            LIVE_DATA_REPLY_DURATION.labels(request_type).observe(time.perf_counter() - start)
+        return result
+
+    async def aclose(self):
+        await self.http_client.aclose()
 
     def __del__(self):
         try:
+            self.precomputed_report_data_service_discovery.stop()
+            self.reply_dispatcher.close()
+            self.live_updates.close()
             self.client.shutdown()
             self.consul.deregister_service()
         except Exception as e:
@@ -0,0 +1,68 @@
+"""Wire format of the messages between the facade and the live data retrieve services.
+
+Used for the live data queue (requests), the reply topics and the values of the live result caches.
+A message is one version byte followed by the msgpack encoding of the object. datetimes are msgpack
+extension types: naive ones (all timestamps in this project are naive UTC) as microseconds since the epoch,
+aware ones as the standard msgpack timestamp, so they decode to the same datetime objects.
+
+Messages written before the format existed are JSON strings and still decode. Writers pick the format
+with encoder(name), so every reader can be upgraded before the writers switch from 'json' to 'msgpack'.
+"""
+import datetime
+import json
+import struct
+
+import msgpack
+
+VERSION = 1
+WIRE_FORMATS = ('msgpack', 'json')
+NAIVE_DATETIME = 1  # msgpack extension type code
+MICROSECONDS = struct.Struct('<q')
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def default(o):
+    if isinstance(o, datetime.datetime):
+        if o.tzinfo is None:
+            return msgpack.ExtType(NAIVE_DATETIME, MICROSECONDS.pack((o - EPOCH) // datetime.timedelta(microseconds=1)))
+        return msgpack.Timestamp.from_datetime(o)
+    if isinstance(o, datetime.date):
+        return o.isoformat()
+    raise TypeError(f"Cannot encode {type(o).__name__}")
+
+
+def ext_hook(code, data):
+    if code == NAIVE_DATETIME:
+        return EPOCH + datetime.timedelta(microseconds=MICROSECONDS.unpack(data)[0])
+    return msgpack.ExtType(code, data)
+
+
+def encode(message):
+    """bytearray (the Hazelcast byte array type) of the version byte and the msgpack encoded message."""
+    return bytearray([VERSION]) + msgpack.packb(message, default=default)
+
+
+def json_default(o):
+    if isinstance(o, (datetime.date, datetime.datetime)):
+        return o.isoformat()
+    raise TypeError(f"Cannot encode {type(o).__name__}")
+
+
+def encode_json(message):
+    """Legacy JSON encoding, datetimes as ISO strings."""
+    return json.dumps(message, default=json_default)
+
+
+def encoder(wire_format):
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Invalid wire format: {wire_format}")
+    return encode if wire_format == 'msgpack' else encode_json
+
+
+def decode(value):
+    if isinstance(value, str):
+        return json.loads(value)  # Legacy JSON message
+    value = memoryview(value)
+    if value[0] != VERSION:
+        raise ValueError(f"Unsupported wire format version: {value[0]}")
+    return msgpack.unpackb(value[1:], ext_hook=ext_hook, timestamp=3)
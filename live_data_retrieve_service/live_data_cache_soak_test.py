@@ -0,0 +1,83 @@
+"""Soak test of the live query result caches against a local Hazelcast: map size and memory must stay bounded.
+
+Simulates --minutes minutes of sum_trades_last_n_minutes traffic (a day by default), compressed so that
+one simulated minute lasts --minute-seconds seconds. Every simulated minute moves the query window, so
+every request uses a new key, exactly like the live service. Entries are written through NearCache with
+a TTL ending at the simulated minute boundary. After every minute the Hazelcast map size, the near
+cache size and the peak RSS of this process are checked against their bounds.
+
+Example:
+    python live_data_cache_soak_test.py --cluster-host localhost --minutes 1440 --minute-seconds 1
+"""
+import argparse
+import datetime
+import resource
+import sys
+import time
+
+import hazelcast
+
+from live_data_near_cache import NearCache
+
+
+def main(args):
+    client = hazelcast.HazelcastClient(cluster_members=[args.cluster_host], cluster_name=args.cluster_name)
+    hazelcast_map = client.get_map(args.map).blocking()
+    hazelcast_map.clear()
+    cache = NearCache(hazelcast_map, capacity=args.near_cache_capacity)
+
+    symbols = [f"SYM{i}USD" for i in range(args.symbols)]
+    keys_per_minute = len(symbols) * len(args.n_minutes)
+    # A key lives for at most one simulated minute; Hazelcast removes expired entries in the background
+    # within a few seconds, so allow the minutes that fit into that lag on top
+    max_map_size = keys_per_minute * (2 + int(args.expiry_lag // args.minute_seconds))
+    base_rss = peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    window_end = datetime.datetime(2024, 1, 1)
+    failures = []
+
+    print(f"{args.minutes} minutes x {keys_per_minute} keys, map size bound {max_map_size}")
+    for minute in range(args.minutes):
+        window_end += datetime.timedelta(minutes=1)
+        minute_end = time.time() + args.minute_seconds
+        for symbol in symbols:
+            for n in args.n_minutes:
+                key = f"{symbol}_{n}_{window_end - datetime.timedelta(minutes=n)}_{window_end}"
+                cache.get_or_load(key, lambda: {'symbol': symbol, 'total_trades': n}, minute_end)
+        time.sleep(max(0.0, minute_end - time.time()))
+
+        map_size = hazelcast_map.size()
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        stats = cache.stats()
+        if map_size > max_map_size:
+            failures.append(f"minute {minute}: map size {map_size} > {max_map_size}")
+        if stats['size'] > args.near_cache_capacity:
+            failures.append(f"minute {minute}: near cache size {stats['size']} > {args.near_cache_capacity}")
+        if minute % args.report_every == 0:
+            print(f"minute {minute:>5}: map size {map_size:>7}, near cache {stats['size']:>7}, "
+                  f"peak RSS {peak_rss:.0f} MiB, {stats}")
+
+    if peak_rss - base_rss > args.max_rss_growth:
+        failures.append(f"peak RSS grew by {peak_rss - base_rss:.0f} MiB > {args.max_rss_growth} MiB")
+
+    cache.close()
+    client.shutdown()
+    if failures:
+        print("FAILED:\n" + "\n".join(failures[:20]))
+        sys.exit(1)
+    print("OK: map size, near cache size and memory stayed bounded")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cluster-host', default='localhost')
+    parser.add_argument('--cluster-name', default='dev')
+    parser.add_argument('--map', default='sum_trades_last_n_minutes_soak')
+    parser.add_argument('--minutes', type=int, default=1440)
+    parser.add_argument('--minute-seconds', type=float, default=1.0)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--n-minutes', type=int, nargs='+', default=[1, 5, 15, 60])
+    parser.add_argument('--near-cache-capacity', type=int, default=10000)
+    parser.add_argument('--expiry-lag', type=float, default=10.0, help="Seconds Hazelcast may take to remove expired entries")
+    parser.add_argument('--max-rss-growth', type=float, default=100.0, help="MiB")
+    parser.add_argument('--report-every', type=int, default=60)
+    main(parser.parse_args())
@@ -0,0 +1,106 @@
+"""Latency of get_latest_prices: Cassandra "latest row" query vs the local mirror of the Hazelcast latest quote book.
+
+Seeds synthetic quote rows into a separate benchmark keyspace and the same latest quotes into a benchmark
+ReplicatedMap, then reports p50/p99 latency of both paths over random symbols.
+
+Example:
+    python live_data_latest_prices_benchmark.py --contact-point localhost --cluster-host localhost --repeat 10000
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+import hazelcast
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+
+from live_data_latest_quotes import LatestQuoteMirror
+
+SCHEMA = [
+    "CREATE KEYSPACE IF NOT EXISTS {keyspace} WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}",
+    """CREATE TABLE IF NOT EXISTS {keyspace}.quote (
+        timestamp TIMESTAMP, symbol TEXT, bidSize BIGINT, bidPrice DOUBLE, askPrice DOUBLE, askSize BIGINT,
+        PRIMARY KEY (symbol, timestamp))"""
+]
+
+
+def seed(session, replicated_map, symbols, quotes_per_symbol, end_timestamp):
+    session.execute("TRUNCATE quote")
+    replicated_map.clear()
+    insert = session.prepare(
+        "INSERT INTO quote (timestamp, symbol, bidSize, bidPrice, askPrice, askSize) VALUES (?, ?, ?, ?, ?, ?)")
+    rows = [
+        (end_timestamp - datetime.timedelta(milliseconds=100 * i), symbol, random.randint(1, 1000),
+         60000 + random.random(), 60001 + random.random(), random.randint(1, 1000))
+        for symbol in symbols
+        for i in range(quotes_per_symbol)
+    ]
+    execute_concurrent_with_args(session, insert, rows, concurrency=64)
+
+    timestamp = int(end_timestamp.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+    replicated_map.put_all({
+        symbol: json.dumps({'bidPrice': 60000.0, 'askPrice': 60001.0, 'bidSize': 1, 'askSize': 1,
+                            'timestamp': timestamp, 'received_at': timestamp, 'confirmed_at': timestamp})
+        for symbol in symbols
+    })
+
+
+def measure(function, symbols, repeat):
+    samples = []
+    for _ in range(repeat):
+        symbol = random.choice(symbols)
+        start = time.perf_counter()
+        function(symbol)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main(args):
+    auth_provider = PlainTextAuthProvider(username=args.username, password=args.password)
+    cluster = Cluster(contact_points=[args.contact_point], auth_provider=auth_provider, protocol_version=3,
+                      load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc='datacenter1')))
+    session = cluster.connect()
+    for statement in SCHEMA:
+        session.execute(statement.format(keyspace=args.keyspace))
+    session.set_keyspace(args.keyspace)
+    statement = session.prepare(
+        "SELECT bidPrice, askPrice, timestamp FROM quote WHERE symbol = ? ORDER BY timestamp DESC LIMIT 1")
+
+    client = hazelcast.HazelcastClient(cluster_members=[args.cluster_host], cluster_name=args.cluster_name)
+    replicated_map = client.get_replicated_map(args.map).blocking()
+
+    symbols = [f"SYM{i}USD" for i in range(args.symbols)]
+    seed(session, replicated_map, symbols, args.quotes_per_symbol, datetime.datetime.utcnow())
+    mirror = LatestQuoteMirror(replicated_map)
+
+    cassandra = measure(lambda symbol: session.execute(statement, (symbol,)).one(), symbols, args.repeat)
+    local = measure(mirror.get, symbols, args.repeat)
+
+    print(f"{args.symbols} symbols, {args.quotes_per_symbol} quotes per symbol, {args.repeat} runs, latency in us")
+    print(f"{'path':>10} {'p50':>10} {'p99':>10}")
+    print(f"{'cassandra':>10} {cassandra[0] * 1e6:>10.1f} {cassandra[1] * 1e6:>10.1f}")
+    print(f"{'mirror':>10} {local[0] * 1e6:>10.1f} {local[1] * 1e6:>10.1f}")
+
+    mirror.close()
+    client.shutdown()
+    cluster.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contact-point', default='localhost')
+    parser.add_argument('--username', default='cassandra')
+    parser.add_argument('--password', default='cassandra')
+    parser.add_argument('--keyspace', default='crypto_project_benchmark')
+    parser.add_argument('--cluster-host', default='localhost')
+    parser.add_argument('--cluster-name', default='dev')
+    parser.add_argument('--map', default='latest_quotes_benchmark')
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--quotes-per-symbol', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    main(parser.parse_args())
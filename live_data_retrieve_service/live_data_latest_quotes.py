@@ -0,0 +1,77 @@
+import json
+import logging
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class LatestQuoteMirror:
+    """Process-local copy of the latest quote book that the ingest service publishes to a Hazelcast ReplicatedMap.
+
+    Filled from the map on start and kept current by its entry events, so a lookup is a dict read.
+    Values are JSON with bidPrice, askPrice, bidSize, askSize, timestamp, received_at and confirmed_at (epoch
+    milliseconds); an older value never replaces a newer one, as events may arrive while the initial snapshot
+    is loaded. The ingest service republishes unchanged quotes with a new confirmed_at as a heartbeat.
+    """
+
+    def __init__(self, replicated_map):
+        self.replicated_map = replicated_map  # Blocking proxy
+
+        self.lock = threading.Lock()
+        self.quotes = {}  # symbol -> decoded value
+
+        self.hits = 0
+        self.misses = 0
+
+        self.listener_id = self.replicated_map.add_entry_listener(
+            added_func=self.on_remote_change, updated_func=self.on_remote_change,
+            removed_func=self.on_remote_remove, evicted_func=self.on_remote_remove,
+            clear_all_func=self.on_remote_clear
+        )
+        for symbol, value in self.replicated_map.entry_set():
+            self.store(symbol, value)
+
+    def store(self, symbol, value):
+        quote = json.loads(value)
+        with self.lock:
+            current = self.quotes.get(symbol)
+            if current is None or quote['timestamp'] >= current['timestamp']:
+                self.quotes[symbol] = quote
+
+    def on_remote_change(self, event):
+        # Called on a Hazelcast client thread
+        try:
+            self.store(event.key, event.value)
+        except Exception as e:
+            logger.error(f"Error updating latest quote of {event.key}: {e}")
+
+    def on_remote_remove(self, event):
+        with self.lock:
+            self.quotes.pop(event.key, None)
+
+    def on_remote_clear(self, event):
+        with self.lock:
+            self.quotes.clear()
+
+    def get(self, symbol):
+        """Latest quote of symbol with its age (since the exchange timestamp) and confirmed_age (since the ingest
+        service last published it as current) in seconds, or None if the ingest service has not published one."""
+        with self.lock:
+            quote = self.quotes.get(symbol)
+            if quote is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        now = time.time()
+        return dict(quote, age=now - quote['timestamp'] / 1000,
+                    confirmed_age=now - quote.get('confirmed_at', quote['received_at']) / 1000)
+
+    def stats(self):
+        with self.lock:
+            return {'symbols': len(self.quotes), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        self.replicated_map.remove_entry_listener(self.listener_id)
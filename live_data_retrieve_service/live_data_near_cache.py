@@ -0,0 +1,118 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+def next_minute_boundary(now=None):
+    """Epoch seconds of the next full minute, when every minute-window result becomes outdated."""
+    now = time.time() if now is None else now
+    return (now // 60 + 1) * 60
+
+
+class NearCache:
+    """Process-local LRU of decoded results in front of a Hazelcast map (values encoded with encode/decode).
+
+    Lookups go local -> Hazelcast -> loader. Concurrent misses for the same key are coalesced, so only
+    one caller per key queries Hazelcast and the loader; the others wait for its result.
+    Local entries expire at their expires_at (epoch seconds) and are invalidated by Hazelcast entry
+    events when the remote entry is updated, removed, evicted or expired.
+    """
+
+    def __init__(self, hazelcast_map, capacity=10000, encode=json.dumps, decode=json.loads):
+        self.hazelcast_map = hazelcast_map
+        self.capacity = capacity
+        self.encode = encode
+        self.decode = decode
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (value, expires_at), least recently used first
+        self.loading = {}  # key -> Future of the caller that loads it
+
+        self.hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+        self.listener_id = self.hazelcast_map.add_entry_listener(
+            updated_func=self.on_remote_change, removed_func=self.on_remote_change,
+            evicted_func=self.on_remote_change, expired_func=self.on_remote_change,
+            clear_all_func=self.on_remote_clear, evict_all_func=self.on_remote_clear
+        )
+
+    def get_or_load(self, key, load, expires_at):
+        """Cached value of key, or load() it; the result is cached locally and in Hazelcast until expires_at."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            future = self.loading.get(key)
+            leader = future is None
+            if leader:
+                future = self.loading[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = self.load_through(key, load, expires_at)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.loading.pop(key, None)
+
+    def load_through(self, key, load, expires_at):
+        cached = self.hazelcast_map.get(key)
+        if cached is not None:
+            value = self.decode(cached)
+            with self.lock:
+                self.remote_hits += 1
+        else:
+            value = load()
+            # Expires in Hazelcast together with the local entry, so the maps do not grow with every new window
+            self.hazelcast_map.put(key, self.encode(value), ttl=max(1.0, expires_at - time.time()))
+            with self.lock:
+                self.misses += 1
+        self.store(key, value, expires_at)
+        return value
+
+    def store(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def on_remote_change(self, event):
+        # Called on a Hazelcast client thread
+        with self.lock:
+            if self.entries.pop(event.key, None) is not None:
+                self.invalidations += 1
+
+    def on_remote_clear(self, event):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'hits': self.hits, 'remote_hits': self.remote_hits,
+                    'misses': self.misses, 'coalesced': self.coalesced, 'invalidations': self.invalidations}
+
+    def close(self):
+        self.hazelcast_map.remove_entry_listener(self.listener_id)
@@ -0,0 +1,109 @@
+"""Latency of the top N cryptos query: cluster-wide ALLOW FILTERING scan vs concurrent per-symbol prepared reads.
+
+Seeds synthetic tradeBin1m data for 10, 50 and 200 symbols into a separate benchmark keyspace
+and reports p50/p99 latency of both query plans.
+
+Example:
+    python live_data_query_benchmark.py --contact-point localhost --minutes 1440 --repeat 50
+"""
+import argparse
+import datetime
+import random
+import time
+
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+
+SCHEMA = [
+    "CREATE KEYSPACE IF NOT EXISTS {keyspace} WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}",
+    """CREATE TABLE IF NOT EXISTS {keyspace}.tradeBin1m (
+        timestamp TIMESTAMP, symbol TEXT, open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE, trades BIGINT,
+        volume DOUBLE, lastSize DOUBLE, turnover DOUBLE, homeNotional DOUBLE, foreignNotional DOUBLE,
+        PRIMARY KEY (symbol, timestamp))"""
+]
+
+
+def seed(session, symbols, minutes, end_timestamp):
+    session.execute("TRUNCATE tradeBin1m")
+    insert = session.prepare(
+        "INSERT INTO tradeBin1m (timestamp, symbol, trades, volume, homeNotional, foreignNotional) VALUES (?, ?, ?, ?, ?, ?)")
+    rows = [
+        (end_timestamp - datetime.timedelta(minutes=minute), symbol, random.randint(0, 100), random.random() * 100,
+         random.random(), random.random() * 1000)
+        for symbol in symbols
+        for minute in range(1, minutes + 1)
+    ]
+    execute_concurrent_with_args(session, insert, rows, concurrency=64)
+
+
+def scan_query(session, start_timestamp, end_timestamp):
+    query = f"""
+        SELECT symbol, SUM(foreignNotional) AS total_volume
+        FROM tradeBin1m
+        WHERE timestamp >= '{start_timestamp.strftime('%Y-%m-%d %H:%M:%S')}'
+        AND timestamp < '{end_timestamp.strftime('%Y-%m-%d %H:%M:%S')}'
+        GROUP BY symbol
+        ALLOW FILTERING
+    """
+    return [(row.symbol, row.total_volume) for row in session.execute(query)]
+
+
+def per_symbol_query(session, statement, symbols, start_timestamp, end_timestamp, concurrency):
+    results = execute_concurrent_with_args(
+        session, statement, [(symbol, start_timestamp, end_timestamp) for symbol in symbols],
+        concurrency=concurrency, raise_on_first_error=True)
+    return [(symbol, rows.one().total_volume) for symbol, (_, rows) in zip(symbols, results) if rows.one().minutes]
+
+
+def measure(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main(args):
+    auth_provider = PlainTextAuthProvider(username=args.username, password=args.password)
+    cluster = Cluster(contact_points=[args.contact_point], auth_provider=auth_provider, protocol_version=3,
+                      load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc='datacenter1')))
+    session = cluster.connect()
+    for statement in SCHEMA:
+        session.execute(statement.format(keyspace=args.keyspace))
+    session.set_keyspace(args.keyspace)
+    statement = session.prepare(
+        "SELECT COUNT(*) AS minutes, SUM(foreignNotional) AS total_volume FROM tradeBin1m "
+        "WHERE symbol = ? AND timestamp >= ? AND timestamp < ?")
+
+    end_timestamp = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+    start_timestamp = end_timestamp - datetime.timedelta(hours=1)
+
+    print(f"{args.minutes} minutes per symbol, {args.repeat} runs, latency in ms")
+    print(f"{'symbols':>8} {'scan p50':>10} {'scan p99':>10} {'per-symbol p50':>15} {'per-symbol p99':>15}")
+    for symbol_count in args.symbols:
+        symbols = [f"SYM{i}USD" for i in range(symbol_count)]
+        seed(session, symbols, args.minutes, end_timestamp)
+        scan = measure(lambda: scan_query(session, start_timestamp, end_timestamp), args.repeat)
+        per_symbol = measure(lambda: per_symbol_query(session, statement, symbols, start_timestamp, end_timestamp,
+                                                      args.concurrency), args.repeat)
+        print(f"{symbol_count:>8} {scan[0] * 1000:>10.1f} {scan[1] * 1000:>10.1f} "
+              f"{per_symbol[0] * 1000:>15.1f} {per_symbol[1] * 1000:>15.1f}")
+
+    cluster.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contact-point', default='localhost')
+    parser.add_argument('--username', default='cassandra')
+    parser.add_argument('--password', default='cassandra')
+    parser.add_argument('--keyspace', default='crypto_project_benchmark')
+    parser.add_argument('--symbols', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--minutes', type=int, default=1440)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=32)
+    main(parser.parse_args())
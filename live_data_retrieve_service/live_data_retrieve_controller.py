@@ -6,11 +6,13 @@ from fastapi import FastAPI, Query, Request
 
 from consul_service_registry import ConsulServiceRegistry
 from live_data_retrieve_service import LiveDataRetrieveService
+from service_metrics import instrument_app
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument_app(app)
 
 consul = ConsulServiceRegistry(consul_host="consul-server", consul_port=8500)
 live_data_retrieve_service = LiveDataRetrieveService(consul=consul)
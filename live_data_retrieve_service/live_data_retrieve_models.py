@@ -49,14 +49,15 @@ class SumTradesLastNMinutesModel:
 
 
 class LatestPricesModel:
-    def __init__(self, symbol="N/A", bidPrice="N/A", askPrice="N/A", timestamp="N/A"):
+    def __init__(self, symbol="N/A", bidPrice="N/A", askPrice="N/A", timestamp="N/A", quote_age="N/A"):
         self.symbol = symbol
         self.bidPrice = bidPrice
         self.askPrice = askPrice
         self.timestamp = timestamp
+        self.quote_age = quote_age  # Seconds since the quote's exchange timestamp
 
     def __str__(self):
-        return f"LatestPrices(symbol={self.symbol}, bidPrice={self.bidPrice}, askPrice={self.askPrice}, timestamp={self.timestamp})"
+        return f"LatestPrices(symbol={self.symbol}, bidPrice={self.bidPrice}, askPrice={self.askPrice}, timestamp={self.timestamp}, quote_age={self.quote_age})"
 
     def __repr__(self):
         return self.__str__()
@@ -66,7 +67,8 @@ class LatestPricesModel:
             'symbol': self.symbol,
             'bidPrice': self.bidPrice,
             'askPrice': self.askPrice,
-            'timestamp': self.timestamp
+            'timestamp': self.timestamp,
+            'quote_age': self.quote_age
         }
 
     def __getitem__(self, key):
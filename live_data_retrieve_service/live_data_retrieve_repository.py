@@ -1,31 +1,80 @@
-import json
 import logging
 import datetime
+import time
 from datetime import timedelta
 
 import hazelcast
-from cassandra.policies import DCAwareRoundRobinPolicy
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
 from cassandra.cluster import Cluster
 from cassandra.auth import PlainTextAuthProvider
+from prometheus_client import Histogram
 
+import live_data_wire_format
+from live_data_latest_quotes import LatestQuoteMirror
+from live_data_near_cache import NearCache, next_minute_boundary
 from live_data_retrieve_models import TopNCryptosLastHourModel, SumTradesLastNMinutesModel, LatestPricesModel
+from live_data_rolling_window import RollingWindowAggregator
+from service_metrics import DURATION_BUCKETS, CallbackMetric
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+VOLUME_TYPES = ('homeNotional', 'foreignNotional', 'volume')
+CASSANDRA_QUERY_DURATION = Histogram('cassandra_query_duration_seconds', "Duration of Cassandra queries", ['query'],
+                                     buckets=DURATION_BUCKETS)
+
 
 class LiveDataRetrieveRepository:
+    """Live data queries; each request is answered by the first layer that has its result.
+
+    sum_trades_last_n_minutes and top_n_cryptos_last_hour:
+      1. The rolling window, a local copy of the last live_data/rolling_window_minutes of tradeBin1m tailed
+         from Cassandra. It answers every range it fully covers, so the layers below only serve its misses:
+         warm-up, ranges longer than the window, and the first poll interval after a minute closes.
+      2. The near cache, then the Hazelcast map, shared by all instances until the minute closes.
+      3. Cassandra: one single-partition SUM for sum_trades; the tradeBin1m_rollup hours for top_n, or
+         per-symbol reads of tradeBin1m while the rollup is incomplete.
+    The near cache counters of cache_requests_total therefore count only lookups after a rolling window
+    miss; the cache="rolling_window" counters show how many requests reach them.
+
+    get_latest_prices: the latest_quotes mirror, then Cassandra for missing or unconfirmed quotes.
+    """
+
     def __init__(self, consul):
         self.consul = consul
 
         self.auth_provider = PlainTextAuthProvider(username=consul.get_config("cassandra/credentials/username"), password=consul.get_config("cassandra/credentials/password"))
         self.cluster = Cluster(contact_points=[consul.get_config("cassandra/contact_point")], auth_provider=self.auth_provider,
-                               load_balancing_policy=DCAwareRoundRobinPolicy(local_dc='datacenter1'),
+                               load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc='datacenter1')),
                                protocol_version=3)
         self.session = self.cluster.connect(keyspace=consul.get_config("cassandra/keyspace"))
 
+        # All queries are restricted to a single symbol partition, so token-aware routing sends them to a replica
+        self.latest_prices_statement = self.session.prepare(
+            "SELECT bidPrice, askPrice, timestamp FROM quote WHERE symbol = ? ORDER BY timestamp DESC LIMIT 1")
+        self.sum_trades_statement = self.session.prepare(
+            "SELECT SUM(trades) AS total_trades FROM tradeBin1m WHERE symbol = ? AND timestamp >= ? AND timestamp < ?")
+        self.sum_volume_statements = {
+            volume_type: self.session.prepare(
+                f"SELECT COUNT(*) AS minutes, SUM({volume_type}) AS total_volume FROM tradeBin1m "
+                f"WHERE symbol = ? AND timestamp >= ? AND timestamp < ?")
+            for volume_type in VOLUME_TYPES
+        }
+        self.rollup_statement = self.session.prepare(
+            "SELECT timestamp, symbol, trades, volume, homeNotional, foreignNotional FROM tradeBin1m_rollup "
+            "WHERE hour = ? AND timestamp >= ? AND timestamp < ?")
+        self.minutes_statement = self.session.prepare(
+            "SELECT timestamp, trades, volume, homeNotional, foreignNotional FROM tradeBin1m "
+            "WHERE symbol = ? AND timestamp >= ? AND timestamp < ?")
+        self.query_concurrency = int(consul.get_config("cassandra/query_concurrency") or 32)
+
+        self.symbols = []
+        self.symbols_refreshed_at = 0
+        self.symbols_refresh_interval = float(consul.get_config("live_data/symbols_refresh_interval") or 60)
+
         self.client = hazelcast.HazelcastClient(
             cluster_members=[consul.get_config("hazelcast/cluster_host")],
             cluster_name=consul.get_config("hazelcast/cluster_name")
@@ -34,135 +83,206 @@ class LiveDataRetrieveRepository:
         self.hz_sum_trades_last_n_minutes_map = self.client.get_map(consul.get_config("hazelcast/sum_trades_last_n_minutes_map")).blocking()
         self.hz_top_n_cryptos_last_hour_map = self.client.get_map(consul.get_config("hazelcast/top_n_cryptos_last_hour_map")).blocking()
 
+        # Two-tier cache of the results the rolling window can't serve: process-local near cache in front of
+        # each Hazelcast map
+        near_cache_capacity = int(consul.get_config("live_data/near_cache_capacity") or 10000)
+        encode = live_data_wire_format.encoder(consul.get_config("live_data/wire_format") or 'msgpack')
+        self.sum_trades_last_n_minutes_cache = NearCache(self.hz_sum_trades_last_n_minutes_map, near_cache_capacity,
+                                                         encode=encode, decode=live_data_wire_format.decode)
+        self.top_n_cryptos_last_hour_cache = NearCache(self.hz_top_n_cryptos_last_hour_map, near_cache_capacity,
+                                                       encode=encode, decode=live_data_wire_format.decode)
+
+        # Latest quotes published by the ingest service; Cassandra is only read for symbols missing from it
+        self.latest_quotes = LatestQuoteMirror(
+            self.client.get_replicated_map(consul.get_config("hazelcast/latest_quotes_map") or "latest_quotes").blocking())
+        self.latest_quote_max_age = float(consul.get_config("live_data/latest_quote_max_age") or 300)
+
+        self.rolling_window = RollingWindowAggregator(
+            load_symbols=self.get_symbols,
+            load_minutes=self.get_minutes,
+            window_minutes=int(consul.get_config("live_data/rolling_window_minutes") or 1440),
+            poll_interval=float(consul.get_config("live_data/rolling_window_poll_interval") or 5)
+        )
+        self.rolling_window.start()
+
+        CallbackMetric('cache_requests_total', "Cache lookups by cache and result", self.cache_request_counts,
+                       ['cache', 'result'], type='counter')
+
+    def execute(self, query_name, statement, parameters=None):
+        with CASSANDRA_QUERY_DURATION.labels(query_name).time():
+            return self.session.execute(statement, parameters)
+
+    def get_symbols(self):
+        """Known symbols (partition keys of tradeBin1m), refreshed every symbols_refresh_interval seconds."""
+        if time.monotonic() - self.symbols_refreshed_at > self.symbols_refresh_interval:
+            self.symbols = [row.symbol for row in self.execute("symbols", "SELECT DISTINCT symbol FROM tradeBin1m")]
+            self.symbols_refreshed_at = time.monotonic()
+        return self.symbols
+
+    def get_minutes(self, symbol, start_timestamp, end_timestamp):
+        return self.execute("minutes", self.minutes_statement, (symbol, start_timestamp, end_timestamp))
+
+    @staticmethod
+    def latest_prices_from_quote(symbol, quote):
+        return LatestPricesModel(
+            symbol=symbol,
+            bidPrice=quote['bidPrice'],
+            askPrice=quote['askPrice'],
+            timestamp=datetime.datetime.utcfromtimestamp(quote['timestamp'] / 1000),
+            quote_age=round(quote['age'], 3)
+        ).to_dict()
+
     def get_latest_prices(self, symbol):
-        query = f"""
-            SELECT bidPrice, askPrice, timestamp
-            FROM quote
-            WHERE symbol = '{symbol}'
-            ORDER BY timestamp DESC
-            LIMIT 1
-        """
+        quote = self.latest_quotes.get(symbol)
+        # Freshness is judged by when the ingest service last confirmed the quote, not by its exchange
+        # timestamp, so unchanged quotes of illiquid symbols are still served from the mirror
+        if quote is not None and quote['confirmed_age'] <= self.latest_quote_max_age:
+            return self.latest_prices_from_quote(symbol, quote)
+
+        # Not published yet or no longer confirmed (e.g. the ingest service is down), Cassandra may have a newer one
+        result = self.get_latest_prices_from_cassandra(symbol)
+        if quote is not None and (result['quote_age'] == "N/A" or result['quote_age'] > quote['age']):
+            return self.latest_prices_from_quote(symbol, quote)
+        return result
 
-        result = self.session.execute(query)
+    def get_latest_prices_from_cassandra(self, symbol):
+        result = self.execute("latest_prices", self.latest_prices_statement, (symbol,))
         if result:
             result_value = result.one()
             result = LatestPricesModel(
                 symbol=symbol,
                 bidPrice=result_value.bidprice,
                 askPrice=result_value.askprice,
-                timestamp=result_value.timestamp
+                timestamp=result_value.timestamp,
+                quote_age=round((datetime.datetime.utcnow() - result_value.timestamp).total_seconds(), 3)
             )
             return result.to_dict()
         return LatestPricesModel(symbol=symbol).to_dict()
 
-    @staticmethod
-    def default(o):
-        """Default JSON serializer for dates and datetimes."""
-        if isinstance(o, (datetime.date, datetime.datetime)):
-            return o.isoformat()
-
-    def check_and_get_if_cached(self, name, start_timestamp, end_timestamp, symbol, n, volume_type=None):
-        if name == 'sum_trades_last_n_minutes':
-            logger.debug(f"Checking cache for {symbol}_{n}_{start_timestamp}_{end_timestamp}")
-            result = self.hz_sum_trades_last_n_minutes_map.get(f"{symbol}_{n}_{start_timestamp}_{end_timestamp}")
-        elif name == 'top_n_cryptos_last_hour':
-            logger.debug(f"Checking cache for {n}_{start_timestamp}_{end_timestamp}_{volume_type}")
-            result = self.hz_top_n_cryptos_last_hour_map.get(f"{n}_{start_timestamp}_{end_timestamp}_{volume_type}")
-        else:
-            raise ValueError(f"Invalid name for check_and_get_if_cached: {name}")
-
-        logger.debug(f"Cache result loaded from Hazelcast: {result}")
-        return json.loads(result) if result else None
-
-    def cache_result(self, name, start_timestamp, end_timestamp, symbol, n, result, volume_type=None):
-        if name == 'sum_trades_last_n_minutes':
-            logger.debug(f"Caching {symbol}_{n}_{start_timestamp}_{end_timestamp}")
-            self.hz_sum_trades_last_n_minutes_map.put(
-                f"{symbol}_{n}_{start_timestamp}_{end_timestamp}",
-                json.dumps(result, default=self.default)
-            )
-        elif name == 'top_n_cryptos_last_hour':
-            logger.debug(f"Caching {n}_{start_timestamp}_{end_timestamp}_{volume_type}")
-            self.hz_top_n_cryptos_last_hour_map.put(
-                f"{n}_{start_timestamp}_{end_timestamp}_{volume_type}",
-                json.dumps(result, default=self.default)
-            )
-        else:
-            raise ValueError(f"Invalid name for cache_result: {name}")
+    def cache_stats(self):
+        return {
+            'sum_trades_last_n_minutes': self.sum_trades_last_n_minutes_cache.stats(),
+            'top_n_cryptos_last_hour': self.top_n_cryptos_last_hour_cache.stats(),
+            'latest_quotes': self.latest_quotes.stats(),
+            'rolling_window': self.rolling_window.stats()
+        }
+
+    def cache_request_counts(self):
+        counts = {}
+        for cache, stats in self.cache_stats().items():
+            for result in ('hits', 'remote_hits', 'misses', 'coalesced'):
+                if result in stats:
+                    counts[(cache, result)] = stats[result]
+        return counts
 
     def sum_trades_last_n_minutes(self, symbol, n_minutes):
         end_timestamp = datetime.datetime.utcnow().replace(second=0, microsecond=0)
         start_timestamp = end_timestamp - timedelta(minutes=n_minutes)
 
-        if cached_result := self.check_and_get_if_cached(
-                'sum_trades_last_n_minutes',
-                start_timestamp,
-                end_timestamp,
-                symbol, n_minutes):
-            logger.info(f"Returning cached result for {symbol} from {start_timestamp} to {end_timestamp}")
-            return cached_result
-
-        query = f"""
-            SELECT SUM(trades) AS total_trades
-            FROM tradeBin1m
-            WHERE symbol = '{symbol}'
-            AND timestamp >= '{start_timestamp.strftime('%Y-%m-%d %H:%M:%S')}'
-            AND timestamp < '{end_timestamp.strftime('%Y-%m-%d %H:%M:%S')}'
-            ALLOW FILTERING
+        total_trades = self.rolling_window.sum_trades(symbol, start_timestamp, end_timestamp)
+        if total_trades is not None:
+            return SumTradesLastNMinutesModel(
+                symbol=symbol,
+                total_trades=total_trades,
+                start_timestamp=start_timestamp,
+                end_timestamp=end_timestamp
+            ).to_dict()
+
+        # The window does not cover the range yet (warm-up or the minute just closed)
+        def load():
+            query_result = self.execute("sum_trades", self.sum_trades_statement,
+                                        (symbol, start_timestamp, end_timestamp))
+            return SumTradesLastNMinutesModel(
+                symbol=symbol,
+                total_trades=query_result.one().total_trades if query_result else 0,
+                start_timestamp=start_timestamp,
+                end_timestamp=end_timestamp
+            ).to_dict()
+
+        # Valid until the next minute closes, when the window moves on
+        return self.sum_trades_last_n_minutes_cache.get_or_load(
+            f"{symbol}_{n_minutes}_{start_timestamp}_{end_timestamp}", load, next_minute_boundary())
+
+    def sum_volume_from_rollup(self, volume_type, start_timestamp, end_timestamp):
+        """Sum volume per symbol from the hourly tradeBin1m_rollup partitions covering the range.
+
+        None if the rollup does not have every minute of the range (not backfilled yet, a backfill still
+        running or an ingest gap), so partial sums are never returned as the volume of the whole range.
         """
+        hours = []
+        hour = start_timestamp.replace(minute=0, second=0, microsecond=0)
+        while hour < end_timestamp:
+            hours.append((hour, start_timestamp, end_timestamp))
+            hour += timedelta(hours=1)
 
-        query_result = self.session.execute(query)
-        total_trades = 0
-        if query_result:
-            total_trades = query_result.one().total_trades
+        with CASSANDRA_QUERY_DURATION.labels("sum_volume_from_rollup").time():
+            results = execute_concurrent_with_args(self.session, self.rollup_statement, hours,
+                                                   concurrency=self.query_concurrency, raise_on_first_error=True)
+        column = volume_type.lower()
+        volumes = {}
+        minutes = set()
+        for _, rows in results:
+            for row in rows:
+                volumes[row.symbol] = volumes.get(row.symbol, 0) + (getattr(row, column) or 0)
+                minutes.add(row.timestamp)
+        expected_minutes = (end_timestamp - start_timestamp) // timedelta(minutes=1)
+        if len(minutes) < expected_minutes:
+            logger.debug(f"tradeBin1m_rollup has {len(minutes)} of {expected_minutes} minutes "
+                         f"from {start_timestamp} to {end_timestamp}")
+            return None
+        return list(volumes.items())
 
-        result = SumTradesLastNMinutesModel(
-            symbol=symbol,
-            total_trades=total_trades,
-            start_timestamp=start_timestamp,
-            end_timestamp=end_timestamp
-        )
+    def sum_volume_per_symbol(self, volume_type, start_timestamp, end_timestamp):
+        """Concurrent per-symbol range reads over the known symbols, merged client-side."""
+        symbols = self.get_symbols()
+        with CASSANDRA_QUERY_DURATION.labels("sum_volume_per_symbol").time():
+            results = execute_concurrent_with_args(
+                self.session,
+                self.sum_volume_statements[volume_type],
+                [(symbol, start_timestamp, end_timestamp) for symbol in symbols],
+                concurrency=self.query_concurrency,
+                raise_on_first_error=True
+            )
 
-        self.cache_result('sum_trades_last_n_minutes', start_timestamp, end_timestamp, symbol, n_minutes, result=result.to_dict())
-        return result.to_dict()
+        volumes = []
+        for symbol, (_, rows) in zip(symbols, results):
+            row = rows.one()
+            if row and row.minutes:
+                volumes.append((symbol, row.total_volume))
+        return volumes
 
     def top_n_cryptos_last_hour(self, n, volume_type='foreignNotional'):
+        if volume_type not in VOLUME_TYPES:
+            raise ValueError(f"Invalid volume_type: {volume_type}")
+
         end_timestamp = datetime.datetime.utcnow().replace(second=0, microsecond=0)
         start_timestamp = end_timestamp - timedelta(hours=1)
 
-        if cached_result := self.check_and_get_if_cached(
-                'top_n_cryptos_last_hour',
-                start_timestamp,
-                end_timestamp,
-                None, n, volume_type):
-            logger.info(f"Returning cached result for top {n} cryptos from {start_timestamp} to {end_timestamp}")
-            return cached_result
-
-        query = f"""
-            SELECT symbol, SUM({volume_type}) AS total_volume
-            FROM tradeBin1m
-            WHERE timestamp >= '{start_timestamp.strftime('%Y-%m-%d %H:%M:%S')}'
-            AND timestamp < '{end_timestamp.strftime('%Y-%m-%d %H:%M:%S')}'
-            GROUP BY symbol
-            ALLOW FILTERING
-        """
-
-        query_result = self.session.execute(query)
+        top_cryptos = self.rolling_window.top_n(n, volume_type, start_timestamp, end_timestamp)
+        if top_cryptos is not None:
+            return TopNCryptosLastHourModel(
+                top_cryptos={symbol: total_volume for symbol, total_volume in top_cryptos},
+                volume_type=volume_type,
+                start_timestamp=start_timestamp,
+                end_timestamp=end_timestamp
+            ).to_dict()
 
-        top_cryptos = []
-        for row in query_result:
-            top_cryptos.append((row.symbol, row.total_volume))
+        # The window does not cover the range yet (warm-up or the minute just closed)
+        def load():
+            top_cryptos = self.sum_volume_from_rollup(volume_type, start_timestamp, end_timestamp)
+            if top_cryptos is None:
+                # Rollup incomplete for this range
+                top_cryptos = self.sum_volume_per_symbol(volume_type, start_timestamp, end_timestamp)
+            top_cryptos = sorted(top_cryptos, key=lambda x: x[1], reverse=True)[:n]
+            return TopNCryptosLastHourModel(
+                top_cryptos={symbol: total_volume for symbol, total_volume in top_cryptos},
+                volume_type=volume_type,
+                start_timestamp=start_timestamp,
+                end_timestamp=end_timestamp
+            ).to_dict()
 
-        top_cryptos = sorted(top_cryptos, key=lambda x: x[1], reverse=True)[:n]
-
-        result = TopNCryptosLastHourModel(
-            top_cryptos={symbol: total_volume for symbol, total_volume in top_cryptos},
-            volume_type=volume_type,
-            start_timestamp=start_timestamp,
-            end_timestamp=end_timestamp
-        )
-        self.cache_result('top_n_cryptos_last_hour', start_timestamp, end_timestamp, None, n, result=result.to_dict(), volume_type=volume_type)
-        return result.to_dict()
+        return self.top_n_cryptos_last_hour_cache.get_or_load(
+            f"{n}_{start_timestamp}_{end_timestamp}_{volume_type}", load, next_minute_boundary())
 
 
 if __name__ == '__main__':
@@ -1,17 +1,36 @@
-import datetime
 import json
 import logging
-from threading import Thread
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore, Thread
 
 import hazelcast
+from prometheus_client import Counter, Histogram
 
+import live_data_wire_format
 from live_data_retrieve_repository import LiveDataRetrieveRepository
+from service_metrics import DURATION_BUCKETS
 
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+LIVE_DATA_TYPES = ('sum_trades_last_n_minutes', 'top_n_cryptos_last_hour', 'get_latest_prices')
+QUEUE_WAIT = Histogram('live_data_queue_wait_seconds', "Time requests spend in the live data queue", ['type'],
+                       buckets=DURATION_BUCKETS)
+REQUEST_DURATION = Histogram('live_data_request_duration_seconds', "Time to compute a live data result", ['type'],
+                             buckets=DURATION_BUCKETS)
+REQUESTS = Counter('live_data_requests_total', "Live data requests by result", ['type', 'result'])
+COALESCED_REQUESTS = Counter('live_data_coalesced_requests_total',
+                             "Requests answered with the result of an identical request in the same batch")
+BATCH_SIZE = Histogram('live_data_batch_size', "Requests taken from the queue at once",
+                       buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+
+
+def request_type(request):
+    return request.get('type') if request.get('type') in LIVE_DATA_TYPES else 'other'
+
 
 class LiveDataRetrieveService:
     def __init__(self, consul):
@@ -23,9 +42,18 @@ class LiveDataRetrieveService:
             cluster_name=consul.get_config("hazelcast/cluster_name")
         )
 
+        self.encode = live_data_wire_format.encoder(consul.get_config("live_data/wire_format") or 'msgpack')
         self.distributed_queue = self.client.get_queue(consul.get_config("hazelcast/live_data_queue")).blocking()
         self.running = True
 
+        # Requests run on a worker pool. Every request taken from the queue holds an in-flight permit until it is
+        # answered and the consumer only takes as many as there are free permits, so while the workers are busy
+        # the remaining requests stay in the distributed queue for other instances
+        self.workers = int(consul.get_config("live_data/consumer_workers") or 8)
+        self.batch_size = int(consul.get_config("live_data/consumer_batch_size") or 32)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.in_flight = BoundedSemaphore(int(consul.get_config("live_data/consumer_max_in_flight") or 2 * self.workers))
+
         self.consumer = Thread(target=self.consume_messages)
         self.consumer.start()
 
@@ -38,46 +66,128 @@ class LiveDataRetrieveService:
     def top_n_cryptos_last_hour(self, n, volume_type='foreignNotional'):
         return self.repository.top_n_cryptos_last_hour(n, volume_type)
 
+    def publish_reply(self, request, result):
+        """Publish the result to the requester's reply topic, tagged with the request's correlation ID."""
+        reply = {'correlation_id': request.get('correlation_id'), 'data': result}
+        self.client.get_topic(request['topic']).publish(self.encode(reply))
+
+    def acquire_permits(self):
+        """Wait up to 3 seconds for a free in-flight permit, then take up to batch_size free ones; 0 if none."""
+        if not self.in_flight.acquire(timeout=3):
+            return 0
+        permits = 1
+        while permits < self.batch_size and self.in_flight.acquire(blocking=False):
+            permits += 1
+        return permits
+
+    def reply_error(self, request, error):
+        """Answer a request that can't be handled with an error, if its reply topic is known."""
+        if not isinstance(request, dict) or 'topic' not in request:
+            REQUESTS.labels('other', 'error').inc()
+            return
+        REQUESTS.labels(request_type(request), 'error').inc()
+        try:
+            self.publish_reply(request, {'error': str(error)})
+        except Exception as e:
+            logger.error(f"Error publishing reply: {e}")
+
+    def take_batch(self, max_size):
+        """Up to max_size requests from the queue; waits up to 3 seconds for the first one."""
+        batch = []
+        self.distributed_queue.drain_to(batch, max_size)
+        if not batch:
+            data = self.distributed_queue.poll(3)
+            if data:
+                batch.append(data)
+                self.distributed_queue.drain_to(batch, max_size - 1)
+        return batch
+
     @staticmethod
-    def default(o):
-        """Default JSON serializer for dates and datetimes."""
-        if isinstance(o, (datetime.date, datetime.datetime)):
-            return o.isoformat()
+    def request_key(request):
+        """Identical queries from different requesters share a key (reply topic, correlation ID and send time excluded)."""
+        return json.dumps({k: v for k, v in request.items() if k not in ('topic', 'correlation_id', 'sent_at')},
+                          sort_keys=True)
+
+    def handle_request(self, json_data):
+        if volume_type := json_data.get('volume_type'):
+            if volume_type not in ('homeNotional', 'foreignNotional', 'volume'):
+                raise ValueError(f"Invalid volume_type: {volume_type}")
+        if json_data['type'] == 'sum_trades_last_n_minutes':
+            return self.sum_trades_last_n_minutes(json_data['symbol'], int(json_data['n_minutes']))
+        elif json_data['type'] == 'top_n_cryptos_last_hour':
+            return self.top_n_cryptos_last_hour(int(json_data['n']), json_data['volume_type'])
+        elif json_data['type'] == 'get_latest_prices':
+            return self.get_latest_prices(json_data['symbol'])
+        logger.error(f"Invalid message type '{json_data['type']}'")
+        return {}
+
+    def handle_requests(self, requests):
+        """Compute one result for a group of identical requests and reply to every requester.
+
+        Releases the in-flight permits of all the requests of the group.
+        """
+        try:
+            kind = request_type(requests[0])
+            start = time.perf_counter()
+            try:
+                result = self.handle_request(requests[0])
+                REQUESTS.labels(kind, 'ok').inc(len(requests))
+            except Exception as e:
+                logger.error(f"Error consuming message: {e}")
+                result = {'error': str(e)}
+                REQUESTS.labels(kind, 'error').inc(len(requests))
+            REQUEST_DURATION.labels(kind).observe(time.perf_counter() - start)
+            COALESCED_REQUESTS.inc(len(requests) - 1)
+            for request in requests:
+                try:
+                    self.publish_reply(request, result)
+                except Exception as e:
+                    logger.error(f"Error publishing reply: {e}")
+        finally:
+            self.in_flight.release(len(requests))
 
     def consume_messages(self):
         while self.running:
-            data = self.distributed_queue.poll(3)
-            if data:
+            permits = self.acquire_permits()
+            if not permits:
+                continue
+            groups = {}
+            batch = self.take_batch(permits)
+            if batch:
+                BATCH_SIZE.observe(len(batch))
+            now = time.time()
+            for data in batch:
+                try:
+                    json_data = live_data_wire_format.decode(data)
+                except Exception as e:
+                    logger.error(f"Error decoding message: {e}")  # Without its reply topic it can't be answered
+                    REQUESTS.labels('other', 'error').inc()
+                    continue
                 try:
-                    json_data = json.loads(data)
-                    logger.info(f"Consuming {json_data}")
-                    if volume_type := json_data.get('volume_type'):
-                        if volume_type not in ('homeNotional', 'foreignNotional', 'volume'):
-                            raise ValueError(f"Invalid volume_type: {volume_type}")
-                    if json_data['type'] == 'sum_trades_last_n_minutes':
-                        result = self.sum_trades_last_n_minutes(json_data['symbol'], int(json_data['n_minutes']))
-                        logger.info(f"Result: {result}")
-                    elif json_data['type'] == 'top_n_cryptos_last_hour':
-                        result = self.top_n_cryptos_last_hour(int(json_data['n']), json_data['volume_type'])
-                        logger.info(f"Result: {result}")
-                    elif json_data['type'] == 'get_latest_prices':
-                        result = self.get_latest_prices(json_data['symbol'])
-                        logger.info(f"Result: {result}")
-                    else:
-                        logger.error(f"Invalid message type '{json_data['type']}'")
-                        result = {}
-                    self.client.get_topic(json_data['topic']).publish(json.dumps(result, default=self.default))
+                    if 'sent_at' in json_data:
+                        QUEUE_WAIT.labels(request_type(json_data)).observe(max(0.0, now - json_data['sent_at']))
+                    groups.setdefault(self.request_key(json_data), []).append(json_data)
                 except Exception as e:
                     logger.error(f"Error consuming message: {e}")
-                    try:
-                        self.client.get_topic(json_data['topic']).publish(json.dumps({'error': str(e)}, default=self.default))
-                    except:
-                        pass
+                    self.reply_error(json_data, e)
+            # Permits of the requests that are not handed to the workers
+            unused_permits = permits - sum(len(requests) for requests in groups.values())
+            if unused_permits:
+                self.in_flight.release(unused_permits)
+            for requests in groups.values():
+                try:
+                    self.executor.submit(self.handle_requests, requests)
+                except Exception as e:
+                    logger.error(f"Error submitting requests: {e}")
+                    self.in_flight.release(len(requests))
+                    for request in requests:
+                        self.reply_error(request, e)
 
     def __del__(self):
         try:
             self.consul.deregister_service()
             self.running = False
             self.consumer.join()
+            self.executor.shutdown()
         except Exception as e:
             logger.error(e)
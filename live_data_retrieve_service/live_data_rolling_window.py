@@ -0,0 +1,162 @@
+import datetime
+import logging
+import threading
+import time
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+FIELDS = ('trades', 'volume', 'homeNotional', 'foreignNotional')
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def to_minute(timestamp):
+    """Minutes since epoch of a naive UTC datetime (as returned by the Cassandra driver)."""
+    return int((timestamp - EPOCH).total_seconds()) // 60
+
+
+class RollingWindowAggregator:
+    """Per-symbol, minute-bucketed ring buffer of tradeBin1m sums kept up to date by tailing Cassandra.
+
+    Every field is a (symbols x window_minutes) NumPy array whose columns are minute slots
+    (minute % window_minutes) shared by all symbols. A background thread warms the buffer up
+    from Cassandra on start and then only reads minutes newer than the last one seen.
+
+    Queries return None when the requested range is not fully covered yet, so the caller can
+    fall back to Cassandra.
+    """
+
+    def __init__(self, load_symbols, load_minutes, window_minutes=1440, poll_interval=5, symbol_capacity=256):
+        # load_symbols() -> iterable of symbols
+        # load_minutes(symbol, start_timestamp, end_timestamp) -> rows with timestamp and FIELDS attributes
+        self.load_symbols = load_symbols
+        self.load_minutes = load_minutes
+        self.window_minutes = window_minutes
+        self.poll_interval = poll_interval
+
+        self.lock = threading.Lock()
+        self.symbols = {}
+        self.slot_minute = np.full(window_minutes, -1, dtype=np.int64)
+        self.data = {field: np.zeros((symbol_capacity, window_minutes), dtype=np.float64) for field in FIELDS}
+        self.present = np.zeros((symbol_capacity, window_minutes), dtype=bool)
+        self.last_seen = {}
+
+        # Minutes [covered_from, covered_until) are complete in the buffer
+        self.covered_from = None
+        self.covered_until = None
+
+        self.hits = 0
+        self.misses = 0  # Queries of ranges not fully covered, answered by the caller's fallback
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        while self.running:
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Error updating rolling window: {e}")
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        """Load every minute newer than the last one seen for each symbol (the whole window on warm up)."""
+        poll_started = datetime.datetime.utcnow()
+        end_timestamp = poll_started.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        window_start = end_timestamp - datetime.timedelta(minutes=self.window_minutes)
+
+        for symbol in self.load_symbols():
+            start_timestamp = self.last_seen.get(symbol, window_start)
+            for row in self.load_minutes(symbol, start_timestamp, end_timestamp):
+                self.record(symbol, row.timestamp, *(getattr(row, field.lower()) or 0 for field in FIELDS))
+                self.last_seen[symbol] = max(self.last_seen.get(symbol, row.timestamp), row.timestamp)
+
+        with self.lock:
+            # Rows with timestamp before the start of the poll have been published by now
+            poll_minute = to_minute(poll_started)
+            if self.covered_from is None:
+                self.covered_from = to_minute(window_start)
+            self.covered_until = poll_minute
+            self.covered_from = max(self.covered_from, poll_minute - self.window_minutes + 1)
+
+    def record(self, symbol, timestamp, trades, volume, home_notional, foreign_notional):
+        minute = to_minute(timestamp)
+        slot = minute % self.window_minutes
+        with self.lock:
+            if minute < self.slot_minute[slot]:
+                return  # older than the window
+            if minute > self.slot_minute[slot]:
+                for field in FIELDS:
+                    self.data[field][:, slot] = 0
+                self.present[:, slot] = False
+                self.slot_minute[slot] = minute
+
+            row = self.symbols.get(symbol)
+            if row is None:
+                row = self._add_symbol(symbol)
+            for field, value in zip(FIELDS, (trades, volume, home_notional, foreign_notional)):
+                self.data[field][row, slot] = value
+            self.present[row, slot] = True
+
+    def _add_symbol(self, symbol):
+        row = len(self.symbols)
+        capacity = self.data[FIELDS[0]].shape[0]
+        if row == capacity:
+            for field in FIELDS:
+                self.data[field] = np.vstack([self.data[field], np.zeros_like(self.data[field])])
+            self.present = np.vstack([self.present, np.zeros_like(self.present)])
+        self.symbols[symbol] = row
+        return row
+
+    def _slots(self, start_timestamp, end_timestamp):
+        """Slots of minutes [start, end), or None when the range is not fully covered."""
+        start_minute, end_minute = to_minute(start_timestamp), to_minute(end_timestamp)
+        if self.covered_from is None or start_minute < self.covered_from or end_minute > self.covered_until:
+            return None
+        minutes = np.arange(start_minute, end_minute)
+        slots = minutes % self.window_minutes
+        # Slots of minutes without any row still hold an older minute
+        return slots[self.slot_minute[slots] == minutes]
+
+    def sum_trades(self, symbol, start_timestamp, end_timestamp):
+        with self.lock:
+            slots = self._slots(start_timestamp, end_timestamp)
+            if slots is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            row = self.symbols.get(symbol)
+            if row is None:
+                return 0
+            return int(self.data['trades'][row, slots].sum())
+
+    def top_n(self, n, volume_type, start_timestamp, end_timestamp):
+        with self.lock:
+            slots = self._slots(start_timestamp, end_timestamp)
+            if slots is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            totals = self.data[volume_type][:len(self.symbols)][:, slots].sum(axis=1)
+            # Symbols without any row in the range don't appear in the Cassandra GROUP BY either
+            present = self.present[:len(self.symbols)][:, slots].any(axis=1)
+            symbols = list(self.symbols)
+        active = [row for row in np.argsort(-totals, kind='stable') if present[row]]
+        return [(symbols[row], float(totals[row])) for row in active[:n]]
+
+    def stats(self):
+        with self.lock:
+            return {'symbols': len(self.symbols), 'hits': self.hits, 'misses': self.misses}
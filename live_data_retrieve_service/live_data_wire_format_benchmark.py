@@ -0,0 +1,56 @@
+"""Encode/decode time and payload size of the live data wire format (msgpack) against the legacy JSON encoding.
+
+Covers the messages that go through Hazelcast: a queue request and the replies / cached values of the
+three live data results (top N with --symbols cryptocurrencies).
+
+Example:
+    python live_data_wire_format_benchmark.py --repeat 100000
+"""
+import argparse
+import datetime
+import json
+import timeit
+
+import live_data_wire_format
+from live_data_retrieve_models import LatestPricesModel, SumTradesLastNMinutesModel, TopNCryptosLastHourModel
+
+
+def sample_messages(symbols):
+    end_timestamp = datetime.datetime.utcnow().replace(second=0, microsecond=0)
+    start_timestamp = end_timestamp - datetime.timedelta(hours=1)
+    reply = {'correlation_id': '0123456789abcdef0123456789abcdef'}
+    return {
+        'request': {'topic': 'get_live_data_topic_00000000-0000-0000-0000-000000000000',
+                    'correlation_id': reply['correlation_id'], 'type': 'sum_trades_last_n_minutes',
+                    'symbol': 'XBTUSD', 'n_minutes': '5'},
+        'sum_trades_last_n_minutes': dict(reply, data=SumTradesLastNMinutesModel(
+            'XBTUSD', 123456, end_timestamp - datetime.timedelta(minutes=5), end_timestamp).to_dict()),
+        'top_n_cryptos_last_hour': dict(reply, data=TopNCryptosLastHourModel(
+            {f"SYM{i}USD": 1234567.891 * (i + 1) for i in range(symbols)}, 'foreignNotional',
+            start_timestamp, end_timestamp).to_dict()),
+        'get_latest_prices': dict(reply, data=LatestPricesModel(
+            'XBTUSD', 63123.5, 63124.0, end_timestamp + datetime.timedelta(seconds=12.345), 0.123).to_dict())
+    }
+
+
+def microseconds(function, repeat):
+    return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat * 1e6
+
+
+def main(args):
+    print(f"{'message':<28} {'format':<8} {'bytes':>6} {'encode us':>10} {'decode us':>10}")
+    for name, message in sample_messages(args.symbols).items():
+        for wire_format in live_data_wire_format.WIRE_FORMATS:
+            encode = live_data_wire_format.encoder(wire_format)
+            encoded = encode(message)
+            assert live_data_wire_format.decode(encoded).keys() == message.keys()
+            size = len(encoded.encode() if isinstance(encoded, str) else encoded)
+            print(f"{name:<28} {wire_format:<8} {size:>6} {microseconds(lambda: encode(message), args.repeat):>10.2f} "
+                  f"{microseconds(lambda: live_data_wire_format.decode(encoded), args.repeat):>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20000)
+    parser.add_argument('--symbols', type=int, default=10, help="Cryptocurrencies in the top N reply")
+    main(parser.parse_args())
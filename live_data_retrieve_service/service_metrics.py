@@ -0,0 +1,99 @@
+"""Shared pieces of the Prometheus metrics (prometheus_client) of the services.
+
+Services define their Counters and Histograms at module level with prometheus_client, duration histograms
+with DURATION_BUCKETS. Values a component already counts in its stats() are exposed with CallbackMetric.
+FastAPI apps serve /metrics with instrument_app(app), other processes (ingest, report computation) with
+prometheus_client.start_http_server(port).
+"""
+import logging
+import threading
+import time
+
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.exposition import choose_encoder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                    300.0)
+
+
+class CallbackCollector:
+    """Collects the callback metrics at scrape time; one instance is registered in the prometheus_client REGISTRY."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}  # name -> CallbackMetric
+
+    def add(self, metric):
+        # A metric added again under the same name (e.g. a callback of a re-created component) replaces it
+        with self.lock:
+            self.metrics[metric.name] = metric
+
+    def collect(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            try:
+                yield metric.collect()
+            except Exception as e:
+                logger.error(f"Error collecting {metric.name}: {e}")
+
+
+CALLBACKS = CallbackCollector()
+REGISTRY.register(CALLBACKS)
+
+
+class CallbackMetric:
+    """Values read from a function at scrape time, e.g. counters a component already keeps in its stats().
+
+    function() returns a number, or a dict of label values (tuples) -> number.
+    """
+
+    def __init__(self, name, documentation, function, labelnames=(), type='gauge'):
+        if type not in ('gauge', 'counter'):
+            raise ValueError(f"Invalid callback metric type: {type}")
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.labelnames = list(labelnames)
+        self.type = type
+        CALLBACKS.add(self)
+
+    def collect(self):
+        family = CounterMetricFamily if self.type == 'counter' else GaugeMetricFamily
+        metric = family(self.name, self.documentation, labels=self.labelnames)
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            metric.add_metric([str(label) for label in label_values], value)
+        return metric
+
+
+HTTP_REQUEST_DURATION = Histogram('http_request_duration_seconds', "Duration of HTTP requests", ['method', 'route'],
+                                  buckets=DURATION_BUCKETS)
+
+
+def instrument_app(app):
+    """Serve /metrics on a FastAPI app and record the duration of every HTTP request by route."""
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    @app.middleware("http")
+    async def record_request_duration(request, call_next):
+        start = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            route = request.scope.get('route')
+            HTTP_REQUEST_DURATION.labels(request.method, route.path if route is not None else 'unmatched') \
+                .observe(time.perf_counter() - start)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(request: Request):
+        encoder, content_type = choose_encoder(request.headers.get('Accept'))
+        return Response(encoder(REGISTRY), media_type=content_type)
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from fastapi.encoders import jsonable_encoder
+from prometheus_client import Counter
+from pymongo.errors import PyMongoError
+
+
+logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+REPORT_CACHE_REQUESTS = Counter('report_cache_requests_total', "Latest report lookups by report and result",
+                                ['report', 'result'])
+
+
+class CachedReport:
+    """A response body serialized once, with its ETag."""
+
+    def __init__(self, content):
+        self.body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+
+    def matches(self, if_none_match):
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in tags or self.etag in tags
+
+
+class LatestReportCache:
+    """In-memory latest response of every report; reads never touch MongoDB once a report is loaded.
+
+    Entries are invalidated by a MongoDB change stream on inserts into the report collections. Change
+    streams need a replica set; on a standalone server the cache falls back to polling the newest
+    report_date of every cached report (a single index entry each) every poll_interval seconds.
+    """
+
+    def __init__(self, repository, build_response, poll_interval=30, retry_interval=5):
+        self.repository = repository
+        self.build_response = build_response
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+
+        self.lock = threading.Lock()
+        self.reports = {}
+        self.report_dates = {}
+        self.generations = {}  # Bumped on every invalidation, so a load racing with one is not cached
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def get(self, report_name):
+        report = self.reports.get(report_name)
+        REPORT_CACHE_REQUESTS.labels(report_name, 'hit' if report is not None else 'miss').inc()
+        if report is None:
+            generation = self.generations.get(report_name, 0)
+            report_date = self.repository.get_latest_report_date(report_name)
+            report = CachedReport(self.build_response(report_name))
+            with self.lock:
+                if self.generations.get(report_name, 0) == generation:
+                    self.reports[report_name] = report
+                    self.report_dates[report_name] = report_date
+        return report
+
+    def invalidate(self, report_name):
+        with self.lock:
+            self.generations[report_name] = self.generations.get(report_name, 0) + 1
+            self.reports.pop(report_name, None)
+            self.report_dates.pop(report_name, None)
+
+    def watch(self):
+        while self.running:
+            try:
+                self.watch_change_stream()
+            except PyMongoError as e:
+                logger.warning(f"Report change stream unavailable ({e}), polling every {self.poll_interval} s")
+                self.poll()
+
+    def watch_change_stream(self):
+        with self.repository.watch_report_inserts() as stream:
+            # Anything published before the stream was opened is unknown, so start from a clean cache
+            for report_name in list(self.reports):
+                self.invalidate(report_name)
+            while self.running:
+                change = stream.try_next()
+                if change is not None:
+                    self.invalidate(change['ns']['coll'])
+                else:
+                    time.sleep(0.1)
+
+    def poll(self):
+        while self.running:
+            time.sleep(self.poll_interval)
+            for report_name, report_date in list(self.report_dates.items()):
+                try:
+                    if self.repository.get_latest_report_date(report_name) != report_date:
+                        self.invalidate(report_name)
+                except PyMongoError as e:
+                    logger.error(f"Error polling {report_name}: {e}")
+                    time.sleep(self.retry_interval)
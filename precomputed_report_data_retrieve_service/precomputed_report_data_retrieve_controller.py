@@ -1,37 +1,91 @@
+import datetime
 import logging
 import os
 from socket import gethostname, gethostbyname
-from fastapi import FastAPI, Query
+from typing import Optional
+
+from fastapi import FastAPI, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
 from consul_service_registry import ConsulServiceRegistry
 from precomputed_report_data_retrieve_service import PrecomputedReportDataRetrieveService
+from service_metrics import instrument_app
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument_app(app)
 
 consul = ConsulServiceRegistry(consul_host="consul-server", consul_port=8500)
 precomputed_report_data_retrieve_service = PrecomputedReportDataRetrieveService(consul=consul)
 
 
+def cached_report_response(report, if_none_match):
+    if report.matches(if_none_match):
+        return Response(status_code=304, headers={"ETag": report.etag})
+    return Response(content=report.body, media_type="application/json", headers={"ETag": report.etag})
+
+
 @app.get("/hourly_transactions")
-async def get_hourly_transactions():
-    return precomputed_report_data_retrieve_service.get_hourly_transactions()
+async def get_hourly_transactions(if_none_match: Optional[str] = Header(None)):
+    return cached_report_response(precomputed_report_data_retrieve_service.get_hourly_transactions(), if_none_match)
 
 
 @app.get("/total_volume")
-async def get_total_volume(volume_type: str = Query("foreignNotional")):
+async def get_total_volume(volume_type: str = Query("foreignNotional"), if_none_match: Optional[str] = Header(None)):
     if volume_type not in ("foreignNotional", "homeNotional"):
         return {"error": f"Invalid volume_type: {volume_type}"}
-    return precomputed_report_data_retrieve_service.get_total_volume(volume_type=volume_type)
+    return cached_report_response(
+        precomputed_report_data_retrieve_service.get_total_volume(volume_type=volume_type), if_none_match)
 
 
 @app.get("/hourly_trades_volume")
-async def get_hourly_trades_volume(volume_type: str = Query("foreignNotional")):
+async def get_hourly_trades_volume(volume_type: str = Query("foreignNotional"),
+                                   if_none_match: Optional[str] = Header(None)):
+    if volume_type not in ("foreignNotional", "homeNotional"):
+        return {"error": f"Invalid volume_type: {volume_type}"}
+    return cached_report_response(
+        precomputed_report_data_retrieve_service.get_hourly_trades_volume(volume_type=volume_type), if_none_match)
+
+
+def report_history_response(report_name, start, end, symbol, cursor, limit):
+    try:
+        lines = precomputed_report_data_retrieve_service.stream_report_history(
+            report_name, start=start, end=end, symbol=symbol, cursor=cursor, limit=limit)
+    except ValueError:
+        return {"error": f"Invalid cursor: {cursor}"}
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.get("/hourly_transactions/history")
+async def get_hourly_transactions_history(start: Optional[datetime.datetime] = Query(None, alias="from"),
+                                          end: Optional[datetime.datetime] = Query(None, alias="to"),
+                                          symbol: Optional[str] = Query(None), cursor: Optional[str] = Query(None),
+                                          limit: int = Query(100, ge=1, le=1000)):
+    return report_history_response('hourly_transactions', start, end, symbol, cursor, limit)
+
+
+@app.get("/total_volume/history")
+async def get_total_volume_history(volume_type: str = Query("foreignNotional"),
+                                   start: Optional[datetime.datetime] = Query(None, alias="from"),
+                                   end: Optional[datetime.datetime] = Query(None, alias="to"),
+                                   symbol: Optional[str] = Query(None), cursor: Optional[str] = Query(None),
+                                   limit: int = Query(100, ge=1, le=1000)):
+    if volume_type not in ("foreignNotional", "homeNotional"):
+        return {"error": f"Invalid volume_type: {volume_type}"}
+    return report_history_response(f"total_volume_{volume_type}", start, end, symbol, cursor, limit)
+
+
+@app.get("/hourly_trades_volume/history")
+async def get_hourly_trades_volume_history(volume_type: str = Query("foreignNotional"),
+                                           start: Optional[datetime.datetime] = Query(None, alias="from"),
+                                           end: Optional[datetime.datetime] = Query(None, alias="to"),
+                                           cursor: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000)):
+    # Aggregated over all symbols, so there is no symbol filter
     if volume_type not in ("foreignNotional", "homeNotional"):
         return {"error": f"Invalid volume_type: {volume_type}"}
-    return precomputed_report_data_retrieve_service.get_hourly_trades_volume(volume_type=volume_type)
+    return report_history_response(f"hourly_trades_volume_{volume_type}", start, end, None, cursor, limit)
 
 
 @app.get('/health')
@@ -1,5 +1,20 @@
+from prometheus_client import Histogram
 from pymongo import MongoClient
 
+from service_metrics import DURATION_BUCKETS
+
+# Columnar report documents keep rows under "columns"; documents written before that keep them under "data"
+REPORT_PROJECTION = {'_id': 0, 'report_date': 1, 'columns': 1, 'data': 1}
+REPORT_COLLECTIONS = (
+    'hourly_transactions',
+    'total_volume_foreignNotional',
+    'hourly_trades_volume_foreignNotional',
+    'total_volume_homeNotional',
+    'hourly_trades_volume_homeNotional'
+)
+MONGO_QUERY_DURATION = Histogram('mongo_query_duration_seconds', "Duration of MongoDB queries", ['operation'],
+                                 buckets=DURATION_BUCKETS)
+
 
 class PrecomputedReportDataRetrieveRepository:
     def __init__(self, consul):
@@ -7,23 +22,36 @@ class PrecomputedReportDataRetrieveRepository:
         self.client = MongoClient(self.consul.get_config("mongodb/uri"))
         self.db_main = self.client[self.consul.get_config("mongodb/database")]
 
-    def get_hourly_transactions(self):
-        db_table = self.db_main['hourly_transactions']
-        latest_data = db_table.find_one({}, sort=[('report_date', -1)])
-
-        return latest_data
-
-    def get_total_volume(self, volume_type: str):
-        db_table = self.db_main[f"total_volume_{volume_type}"]
-        latest_data = db_table.find_one({}, sort=[('report_date', -1)])
-
-        return latest_data
-
-    def get_hourly_trades_volume(self, volume_type: str):
-        db_table = self.db_main[f"hourly_trades_volume_{volume_type}"]
-        latest_data = db_table.find_one({}, sort=[('report_date', -1)])
-
-        return latest_data
+    def get_latest_report(self, report_name: str):
+        with MONGO_QUERY_DURATION.labels("latest_report").time():
+            return self.db_main[report_name].find_one({}, REPORT_PROJECTION, sort=[('report_date', -1)])
+
+    def get_latest_report_date(self, report_name: str):
+        with MONGO_QUERY_DURATION.labels("latest_report_date").time():
+            latest = self.db_main[report_name].find_one({}, {'_id': 0, 'report_date': 1},
+                                                        sort=[('report_date', -1)])
+        return latest['report_date'] if latest else None
+
+    def find_reports(self, report_name: str, start=None, end=None, symbol=None, after=None, limit=100):
+        """Cursor over the reports in [start, end) after the report_date `after`, oldest first, fetched in batches."""
+        report_date = {}
+        if start is not None:
+            report_date['$gte'] = start
+        if end is not None:
+            report_date['$lt'] = end
+        if after is not None:
+            report_date['$gt'] = after
+        query = {'report_date': report_date} if report_date else {}
+        if symbol is not None:
+            # Served by the (symbol, report_date) indexes of both layouts
+            query['$or'] = [{'columns.symbol': symbol}, {'data.symbol': symbol}]
+        return self.db_main[report_name].find(query, REPORT_PROJECTION, sort=[('report_date', 1)], limit=limit,
+                                              batch_size=min(limit, 100))
+
+    def watch_report_inserts(self):
+        """Change stream of new report documents (needs a replica set)."""
+        return self.db_main.watch([{'$match': {'operationType': 'insert', 'ns.coll': {'$in': list(REPORT_COLLECTIONS)}}}],
+                                  max_await_time_ms=1000)
 
     def __del__(self):
         self.client.close()
@@ -1,4 +1,10 @@
+import datetime
+import json
 import logging
+
+from fastapi.encoders import jsonable_encoder
+
+from precomputed_report_data_retrieve_cache import LatestReportCache
 from precomputed_report_data_retrieve_repository import PrecomputedReportDataRetrieveRepository
 
 
@@ -7,31 +13,75 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+def report_rows(document):
+    """Rows of a report document as a list of records, for both the columnar and the legacy layout."""
+    if 'columns' not in document:
+        return document['data']
+    columns = document['columns']
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def to_json_line(content):
+    return (json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
 class PrecomputedReportDataRetrieveService:
     def __init__(self, consul):
         self.consul = consul
         self.repository = PrecomputedReportDataRetrieveRepository(consul=self.consul)
+        self.cache = LatestReportCache(
+            self.repository, self.build_response,
+            poll_interval=int(self.consul.get_config("precomputed/cache_poll_interval") or 30)
+        )
+        self.cache.start()
 
-    def get_hourly_transactions(self):
-        data = self.repository.get_hourly_transactions()
+    def build_response(self, report_name: str):
+        data = self.repository.get_latest_report(report_name)
         if not data:
             return {"error": "No data found! Wait for the next computation cycle!"}
-        return {"report_date": data["report_date"], "report_name": 'hourly_transactions', "data": data["data"]}
+        return {"report_date": data["report_date"], "report_name": report_name, "data": report_rows(data)}
+
+    # The getters return a CachedReport (pre-serialized JSON body and ETag)
+    def get_hourly_transactions(self):
+        return self.cache.get('hourly_transactions')
 
     def get_total_volume(self, volume_type: str):
-        data = self.repository.get_total_volume(volume_type=volume_type)
-        if not data:
-            return {"error": "No data found! Wait for the next computation cycle!"}
-        return {"report_date": data["report_date"], 'report_name': f"total_volume_{volume_type}", "data": data["data"]}
+        return self.cache.get(f"total_volume_{volume_type}")
 
     def get_hourly_trades_volume(self, volume_type: str):
-        data = self.repository.get_hourly_trades_volume(volume_type=volume_type)
-        if not data:
-            return {"error": "No data found! Wait for the next computation cycle!"}
-        return {"report_date": data["report_date"], 'report_name': f"hourly_trades_volume_{volume_type}", "data": data["data"]}
+        return self.cache.get(f"hourly_trades_volume_{volume_type}")
+
+    def stream_report_history(self, report_name: str, start=None, end=None, symbol=None, cursor=None, limit=100):
+        """NDJSON lines, one report document each, oldest first.
+
+        At most `limit` documents are returned; if there are more, the last line is {"next_cursor": ...},
+        to be passed back as `cursor` for the next page. Documents are read from MongoDB in batches,
+        so memory does not grow with the size of the range.
+        """
+        after = datetime.datetime.fromisoformat(cursor) if cursor else None  # Raises ValueError if invalid
+        documents = self.repository.find_reports(report_name, start=start, end=end, symbol=symbol, after=after,
+                                                 limit=limit + 1)
+
+        def lines():
+            last_report_date = None
+            try:
+                for count, document in enumerate(documents):
+                    if count == limit:
+                        yield to_json_line({"next_cursor": last_report_date.isoformat()})
+                        break
+                    rows = report_rows(document)
+                    if symbol is not None:
+                        rows = [row for row in rows if row.get('symbol') == symbol]
+                    last_report_date = document['report_date']
+                    yield to_json_line({"report_date": last_report_date, "report_name": report_name, "data": rows})
+            finally:
+                documents.close()
+
+        return lines()
 
     def __del__(self):
         try:
+            self.cache.stop()
             self.consul.deregister_service()
         except Exception as e:
             logger.error(e)
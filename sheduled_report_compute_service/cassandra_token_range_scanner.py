@@ -0,0 +1,231 @@
+"""Token-range parallel Cassandra table scanner that streams columnar NumPy chunks with bounded memory.
+
+The Murmur3 token ring is split into ranges; worker processes (each with its own driver session) take
+the ranges from a queue, read them with paging and convert every page into NumPy columns. Pages travel to
+the caller through a bounded queue, so at most max_in_flight_chunks pages (plus one page being built per
+worker) are held in memory at any time, no matter how much data the scan covers. A worker that dies
+(e.g. killed for memory) or a scan that exceeds its timeout fails the scan instead of hanging it.
+
+Example:
+    python cassandra_token_range_scanner.py --contact-point localhost --keyspace crypto_project \\
+        --table tradeBin1m --columns symbol timestamp trades --where "timestamp >= '2024-05-01'"
+"""
+import argparse
+import logging
+import queue
+import resource
+import time
+from multiprocessing import get_context
+
+import numpy as np
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.cluster import Cluster
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import tuple_factory
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+MIN_TOKEN = -2 ** 63  # Murmur3Partitioner token range
+MAX_TOKEN = 2 ** 63 - 1
+
+# Set in every worker process by init_worker
+worker_session = None
+worker_statement = None
+worker_columns = None
+worker_chunks = None
+worker_error = None
+
+
+def split_token_ring(split_count):
+    """Split the Murmur3 token ring into split_count contiguous (start, end] ranges."""
+    step = (MAX_TOKEN - MIN_TOKEN) // split_count
+    bounds = [MIN_TOKEN + step * i for i in range(split_count)] + [MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def connection_from_consul(consul):
+    """Plain connection settings (picklable, unlike the Consul client) for the worker processes."""
+    return {
+        'contact_point': consul.get_config("cassandra/contact_point"),
+        'username': consul.get_config("cassandra/credentials/username"),
+        'password': consul.get_config("cassandra/credentials/password"),
+        'keyspace': consul.get_config("cassandra/keyspace")
+    }
+
+
+def to_columns(rows, columns):
+    """Convert a page of row tuples to a dict of NumPy arrays; nulls become NaN/NaT (or None for object)."""
+    return {name: np.array(values, dtype=dtype) for (name, dtype), values in zip(columns.items(), zip(*rows))}
+
+
+def init_worker(connect, connection, query, fetch_size, columns, chunks):
+    global worker_session, worker_statement, worker_columns, worker_chunks, worker_error
+    worker_columns = columns
+    worker_chunks = chunks
+    try:
+        worker_session, worker_statement = connect(connection, query, fetch_size)
+    except Exception as e:
+        # Reported for every token range this worker takes, so the caller gets the error
+        worker_error = e
+
+
+def scan_worker(connect, connection, query, fetch_size, columns, chunks, token_ranges, parameters):
+    """Runs in a worker process: scan token ranges from the token_ranges queue until it yields None."""
+    init_worker(connect, connection, query, fetch_size, columns, chunks)
+    while True:
+        token_range = token_ranges.get()
+        if token_range is None:
+            return
+        scan_token_range(token_range, parameters)
+
+
+def connect_worker(connection, query, fetch_size):
+    """Session and prepared statement of a worker process."""
+    cluster = Cluster(contact_points=[connection['contact_point']],
+                      auth_provider=PlainTextAuthProvider(username=connection['username'],
+                                                          password=connection['password']),
+                      load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc='datacenter1')),
+                      protocol_version=3)
+    session = cluster.connect(keyspace=connection['keyspace'])
+    session.row_factory = tuple_factory
+    statement = session.prepare(query)
+    statement.fetch_size = fetch_size
+    return session, statement
+
+
+def scan_token_range(token_range, parameters):
+    """Runs in a worker process: page through one token range, sending every page as a chunk."""
+    rows = 0
+    try:
+        if worker_error is not None:
+            raise worker_error
+        result = worker_session.execute(worker_statement, (*token_range, *parameters))
+        while True:
+            if result.current_rows:
+                rows += len(result.current_rows)
+                worker_chunks.put(('chunk', to_columns(result.current_rows, worker_columns)))  # Blocks when full
+            if not result.has_more_pages:
+                break
+            result.fetch_next_page()
+    except Exception as e:
+        worker_chunks.put(('error', f"Token range {token_range}: {e!r}"))
+        return
+    worker_chunks.put(('done', rows))
+
+
+class TokenRangeScanner:
+    """Scan of one table with optional extra predicates, yielded as {column: ndarray} chunks.
+
+    columns maps the selected column names to NumPy dtypes (object keeps Python values as they are).
+    where is an extra CQL predicate with ? placeholders, e.g. "timestamp >= ? AND timestamp < ?";
+    restricting clustering columns makes the query need ALLOW FILTERING, as the Spark connector does.
+    connect(connection, query, fetch_size) -> (session, prepared statement) runs in every worker process;
+    it must be a module-level function so it can be sent to them.
+    """
+
+    def __init__(self, connection, table, columns, partition_key, where=None, split_count=64, processes=4,
+                 fetch_size=5000, max_in_flight_chunks=16, connect=connect_worker, timeout=None):
+        self.connection = connection
+        self.timeout = timeout  # Seconds for a whole scan, None for no limit
+        self.connect = connect
+        self.columns = dict(columns)
+        self.split_count = split_count
+        self.processes = processes
+        self.fetch_size = fetch_size
+        self.max_in_flight_chunks = max_in_flight_chunks
+        self.query = f"SELECT {', '.join(self.columns)} FROM {table} " \
+                     f"WHERE token({partition_key}) > ? AND token({partition_key}) <= ?"
+        if where:
+            self.query += f" AND {where} ALLOW FILTERING"
+
+    def scan(self, parameters=()):
+        """Yield chunks until every token range has been read; stopping early terminates the workers.
+
+        Raises RuntimeError when a token range fails or a worker process dies, TimeoutError when the scan
+        takes longer than timeout seconds.
+        """
+        context = get_context('spawn')  # The driver is not fork-safe; every worker opens its own session
+        chunks = context.Queue(maxsize=self.max_in_flight_chunks)
+        token_ranges = context.Queue()
+        ranges = split_token_ring(self.split_count)
+        for token_range in ranges:
+            token_ranges.put(token_range)
+        for _ in range(self.processes):
+            token_ranges.put(None)
+        workers = [context.Process(target=scan_worker, daemon=True,
+                                   args=(self.connect, self.connection, self.query, self.fetch_size, self.columns,
+                                         chunks, token_ranges, tuple(parameters)))
+                   for _ in range(self.processes)]
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            for worker in workers:
+                worker.start()
+            remaining = len(ranges)
+            checked_at = time.monotonic()
+            while remaining:
+                try:
+                    kind, payload = chunks.get(timeout=1)
+                except queue.Empty:
+                    kind = None
+                if time.monotonic() - checked_at >= 1 or kind is None:
+                    checked_at = time.monotonic()
+                    self.check_workers(workers, deadline)
+                if kind == 'chunk':
+                    yield payload
+                elif kind == 'done':
+                    remaining -= 1
+                elif kind == 'error':
+                    raise RuntimeError(payload)
+        finally:
+            token_ranges.cancel_join_thread()  # Ranges not taken by the terminated workers are discarded
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in workers:
+                if worker.pid is not None:
+                    worker.join()
+
+    def check_workers(self, workers, deadline):
+        for worker in workers:
+            # A worker that scanned all its ranges exits with 0 after its last 'done'
+            if worker.exitcode not in (None, 0):
+                raise RuntimeError(f"Scan worker {worker.pid} died with exit code {worker.exitcode}")
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Scan not finished within {self.timeout} s")
+
+def main(args):
+    connection = {'contact_point': args.contact_point, 'username': args.username, 'password': args.password,
+                  'keyspace': args.keyspace}
+    scanner = TokenRangeScanner(connection, args.table, {column: object for column in args.columns},
+                                args.partition_key, where=args.where, split_count=args.splits,
+                                processes=args.processes, fetch_size=args.fetch_size,
+                                max_in_flight_chunks=args.max_in_flight_chunks, timeout=args.timeout)
+    start = time.perf_counter()
+    rows = chunks = 0
+    for chunk in scanner.scan():
+        chunks += 1
+        rows += len(next(iter(chunk.values())))
+    elapsed = time.perf_counter() - start
+    logger.info(f"Scanned {rows} rows in {chunks} chunks in {elapsed:.1f} s ({rows / elapsed:.0f} rows/sec), "
+                f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contact-point', default='localhost')
+    parser.add_argument('--username', default='cassandra')
+    parser.add_argument('--password', default='cassandra')
+    parser.add_argument('--keyspace', default='crypto_project')
+    parser.add_argument('--table', default='tradeBin1m')
+    parser.add_argument('--partition-key', default='symbol')
+    parser.add_argument('--columns', nargs='+', default=['symbol', 'timestamp', 'trades'])
+    parser.add_argument('--where', help="Extra CQL predicate with literal values")
+    parser.add_argument('--splits', type=int, default=64)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--fetch-size', type=int, default=5000)
+    parser.add_argument('--max-in-flight-chunks', type=int, default=16)
+    parser.add_argument('--timeout', type=float, help="Seconds for the whole scan (default: no limit)")
+    main(parser.parse_args())
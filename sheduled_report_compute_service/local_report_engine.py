@@ -0,0 +1,108 @@
+import logging
+
+import numpy as np
+
+from cassandra_token_range_scanner import TokenRangeScanner, connection_from_consul
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+TRADEBIN1M_COLUMNS = {
+    'symbol': object,
+    'timestamp': 'datetime64[ms]',
+    'trades': np.float64,  # float so that nulls become NaN
+    'homeNotional': np.float64,
+    'foreignNotional': np.float64
+}
+
+
+class HourlyAggregates:
+    """(symbol, hour) sums of trades and notionals, accumulated from columnar chunks with NumPy.
+
+    Like Spark's sum, nulls are skipped and a sum over only nulls is None, not 0.
+    """
+
+    def __init__(self, start_hour, hours):
+        self.start_hour = np.datetime64(start_hour, 'h')
+        self.hours = hours
+        self.symbols = {}
+        self.totals = np.zeros((0, hours, 2))  # homeNotional, foreignNotional
+        self.trades = np.zeros((0, hours), dtype=np.int64)
+        self.counts = np.zeros((0, hours), dtype=np.int64)
+        self.non_null = np.zeros((0, hours, 3), dtype=np.int64)  # trades, homeNotional, foreignNotional
+
+    def symbol_indexes(self, symbols):
+        for symbol in set(symbols).difference(self.symbols):
+            self.symbols[symbol] = len(self.symbols)
+        if len(self.symbols) > len(self.counts):
+            grow = max(len(self.symbols), 2 * len(self.counts)) - len(self.counts)
+            self.totals = np.concatenate([self.totals, np.zeros((grow, self.hours, 2))])
+            self.trades = np.concatenate([self.trades, np.zeros((grow, self.hours), dtype=np.int64)])
+            self.counts = np.concatenate([self.counts, np.zeros((grow, self.hours), dtype=np.int64)])
+            self.non_null = np.concatenate([self.non_null, np.zeros((grow, self.hours, 3), dtype=np.int64)])
+        return np.fromiter((self.symbols[symbol] for symbol in symbols), dtype=np.int64, count=len(symbols))
+
+    def add(self, symbols, timestamps, trades, home_notional, foreign_notional):
+        """Add one chunk of rows; timestamps are datetime64, numeric columns use NaN for nulls."""
+        if not len(symbols):
+            return
+        rows = self.symbol_indexes(symbols)
+        hours = (timestamps.astype('datetime64[h]') - self.start_hour).astype(np.int64)
+        inside = (hours >= 0) & (hours < self.hours)
+        rows, hours = rows[inside], hours[inside]
+        trades, home_notional, foreign_notional = trades[inside], home_notional[inside], foreign_notional[inside]
+        np.add.at(self.counts, (rows, hours), 1)
+        for column, values in enumerate((trades, home_notional, foreign_notional)):
+            np.add.at(self.non_null[:, :, column], (rows, hours), ~np.isnan(values))
+        np.add.at(self.trades, (rows, hours), np.nan_to_num(trades).astype(np.int64))
+        np.add.at(self.totals[:, :, 0], (rows, hours), np.nan_to_num(home_notional))
+        np.add.at(self.totals[:, :, 1], (rows, hours), np.nan_to_num(foreign_notional))
+
+    def to_records(self):
+        records = []
+        for symbol, row in self.symbols.items():
+            for hour in np.flatnonzero(self.counts[row]):
+                non_null = self.non_null[row, hour]
+                records.append({
+                    'symbol': symbol,
+                    'hour': (self.start_hour + hour).astype('datetime64[s]').item(),
+                    'trades': int(self.trades[row, hour]) if non_null[0] else None,
+                    'homeNotional': float(self.totals[row, hour, 0]) if non_null[1] else None,
+                    'foreignNotional': float(self.totals[row, hour, 1]) if non_null[2] else None
+                })
+        return records
+
+
+class LocalReportEngine:
+    """Hourly (symbol, hour) aggregates of tradeBin1m computed in-process, without a Spark cluster.
+
+    tradeBin1m is read with a token-range parallel scan and every chunk is folded into NumPy
+    aggregates, so memory is bounded by (symbols x hours) plus the scanner's in-flight chunks, not by rows.
+    """
+
+    def __init__(self, consul):
+        self.consul = consul
+        # Same pushdown as the Spark connector: token range scans with the clustering range applied on the replicas
+        self.scanner = TokenRangeScanner(
+            connection_from_consul(consul), "tradeBin1m", TRADEBIN1M_COLUMNS, partition_key="symbol",
+            where="timestamp >= ? AND timestamp < ?",
+            split_count=int(consul.get_config("report/token_range_splits") or 64),
+            processes=int(consul.get_config("report/scan_processes") or 4),
+            fetch_size=int(consul.get_config("report/fetch_size") or 5000),
+            max_in_flight_chunks=int(consul.get_config("report/scan_max_in_flight_chunks") or 16),
+            timeout=float(consul.get_config("report/scan_timeout") or 1800)
+        )
+
+    def aggregate_hours(self, start_timestamp, end_timestamp):
+        """Sum trades and notionals per (symbol, hour) for whole hours in [start_timestamp, end_timestamp)."""
+        hours = int((end_timestamp - start_timestamp).total_seconds() // 3600)
+        aggregates = HourlyAggregates(start_timestamp, hours)
+        for chunk in self.scanner.scan((start_timestamp, end_timestamp)):
+            aggregates.add(chunk['symbol'], chunk['timestamp'], chunk['trades'], chunk['homeNotional'],
+                           chunk['foreignNotional'])
+        return aggregates.to_records()
+
+    def stop(self):
+        pass
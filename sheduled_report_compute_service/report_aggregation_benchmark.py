@@ -0,0 +1,138 @@
+"""Wall time and shuffle bytes of the report job: legacy five-job version vs one shared (symbol, hour) aggregation.
+
+Runs on a local Spark session (no cluster, no Cassandra) over synthetic tradeBin1m rows covering the
+last --hours hours for --symbols symbols. Shuffle bytes are read from the Spark UI REST API per job group.
+
+Example:
+    python report_aggregation_benchmark.py --symbols 200 --hours 13 --repeat 3
+"""
+import argparse
+import datetime
+import json
+import time
+import urllib.request
+
+import pandas as pd
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+from sheduled_report_compute_service import CryptoStatistics
+from spark_report_engine import SparkReportEngine
+
+
+def compute_hourly_transactions(df):
+    return df \
+        .withColumn("hour", F.hour("timestamp")) \
+        .groupBy("symbol", "hour") \
+        .agg(F.sum("trades").alias("transaction_count")) \
+        .filter(
+        (F.col("hour") >= F.hour(F.current_timestamp()) - 6)
+        & (F.col("hour") != F.hour(F.current_timestamp()))
+    ).sort(
+        F.col("transaction_count").desc()
+    ).toPandas()
+
+
+def compute_total_volume(df, volume_type):
+    start_hour = F.date_trunc("hour", F.current_timestamp() - F.expr("INTERVAL 6 HOURS"))
+    return df.filter(
+        (F.date_trunc("hour", F.col("timestamp")) >= start_hour)
+        & (F.date_trunc("hour", F.col("timestamp")) < F.date_trunc("hour", F.current_timestamp()))
+    ).groupBy("symbol").agg(F.sum(volume_type).alias("total_volume")).sort(F.col("total_volume").desc()).toPandas()
+
+
+def compute_hourly_trades_volume(df, volume_type):
+    start_hour = F.date_trunc("hour", F.current_timestamp() - F.expr("INTERVAL 12 HOURS"))
+    return df \
+        .withColumn("hour", F.hour("timestamp")) \
+        .filter((F.col("timestamp") >= start_hour) & (F.col("hour") != F.hour(F.current_timestamp()))) \
+        .groupBy("hour") \
+        .agg(F.sum("trades").alias("trade_count"), F.sum(volume_type).alias("total_volume")) \
+        .sort(F.col("trade_count").desc()).toPandas()
+
+
+def five_jobs(df, current_hour):
+    """The report job before the shared aggregation: one scan, groupBy and shuffle per report."""
+    return {
+        "hourly_transactions": compute_hourly_transactions(df),
+        "total_volume_foreignNotional": compute_total_volume(df, "foreignNotional"),
+        "hourly_trades_volume_foreignNotional": compute_hourly_trades_volume(df, "foreignNotional"),
+        "total_volume_homeNotional": compute_total_volume(df, "homeNotional"),
+        "hourly_trades_volume_homeNotional": compute_hourly_trades_volume(df, "homeNotional")
+    }
+
+
+def single_pass(df, current_hour):
+    start_hour = current_hour - datetime.timedelta(hours=12)
+    df = df.filter((F.col("timestamp") >= F.lit(start_hour)) & (F.col("timestamp") < F.lit(current_hour)))
+    return CryptoStatistics.derive_reports(pd.DataFrame(SparkReportEngine.aggregate_dataframe(df)), current_hour)
+
+
+def synthetic_tradeBin1m(spark, symbols, hours, end_timestamp):
+    """One row per symbol and minute, like the connector would return for tradeBin1m."""
+    start = int(end_timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()) - hours * 3600
+    return spark.range(symbols * hours * 60) \
+        .select(
+        F.concat(F.lit("SYM"), (F.col("id") % symbols).cast("string"), F.lit("USD")).alias("symbol"),
+        F.timestamp_seconds(F.lit(start) + (F.col("id") / symbols).cast("long") * 60).alias("timestamp"),
+        (F.rand(1) * 100).cast("long").alias("trades"),
+        (F.rand(2) * 1000).alias("volume"),
+        F.rand(3).alias("homeNotional"),
+        (F.rand(4) * 10000).alias("foreignNotional"))
+
+
+def shuffle_write_bytes(spark, job_group):
+    base_url = f"{spark.sparkContext.uiWebUrl}/api/v1/applications/{spark.sparkContext.applicationId}"
+
+    def get(path):
+        with urllib.request.urlopen(f"{base_url}/{path}") as response:
+            return json.load(response)
+
+    stage_ids = {stage_id for job in get("jobs") if job.get("jobGroup") == job_group for stage_id in job["stageIds"]}
+    return sum(stage["shuffleWriteBytes"] for stage in get("stages") if stage["stageId"] in stage_ids)
+
+
+def measure(spark, name, function, df, current_hour, repeat):
+    samples, shuffled = [], []
+    for run in range(repeat):
+        job_group = f"{name}-{run}"
+        spark.sparkContext.setJobGroup(job_group, name)
+        start = time.perf_counter()
+        function(df, current_hour)
+        samples.append(time.perf_counter() - start)
+        time.sleep(1)  # Let the UI listener catch up before reading stage metrics
+        shuffled.append(shuffle_write_bytes(spark, job_group))
+    return min(samples), max(shuffled)
+
+
+def main(args):
+    spark = SparkSession.builder \
+        .appName("ReportAggregationBenchmark") \
+        .config("spark.master", args.master) \
+        .config("spark.sql.session.timeZone", "UTC") \
+        .config("spark.ui.enabled", "true") \
+        .getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+
+    current_hour = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    end_timestamp = current_hour + datetime.timedelta(hours=1)
+    # Materialized once so both versions pay the same (zero) source cost, like a pushed-down Cassandra read
+    df = synthetic_tradeBin1m(spark, args.symbols, args.hours, end_timestamp).cache()
+    rows = df.count()
+
+    print(f"{rows} rows ({args.symbols} symbols, {args.hours} hours), best of {args.repeat} runs")
+    print(f"{'version':>12} {'wall s':>8} {'shuffle KiB':>12}")
+    for name, function in (("five jobs", five_jobs), ("single pass", single_pass)):
+        wall, shuffled = measure(spark, name, function, df, current_hour, args.repeat)
+        print(f"{name:>12} {wall:>8.2f} {shuffled / 1024:>12.1f}")
+
+    spark.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--master', default='local[*]')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--hours', type=int, default=13)
+    parser.add_argument('--repeat', type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,138 @@
+"""Parity check and benchmark of the report engines: Spark vs local (in-process NumPy).
+
+Each engine runs in a fresh process over the same closed hours of tradeBin1m, so startup includes
+imports, the JVM and the Spark connector download for the Spark engine. Peak memory is the peak RSS
+of the Python process plus, for Spark, the peak RSS of its driver JVM.
+The (symbol, hour) aggregates and the five derived reports must match (up to float summation order),
+otherwise the script exits with an error. Both engines also aggregate a small in-memory case with null
+columns, where an all-null sum must be null (not 0) in both.
+
+Example:
+    python report_engine_benchmark.py --consul-host localhost --hours 12
+"""
+import argparse
+import datetime
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from consul_service_registry import ConsulServiceRegistry
+from sheduled_report_compute_service import CryptoStatistics, REPORT_ENGINES
+
+
+def peak_rss_mb(pid='self'):
+    """VmHWM of a process from /proc (Linux), in MiB."""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+NULL_CASE_HOUR = datetime.datetime(2024, 1, 1)
+NULL_CASE_SCHEMA = "symbol string, timestamp timestamp, trades long, homeNotional double, foreignNotional double"
+NULL_CASE_ROWS = [
+    # All-null trades and notionals in the first hour, mixed nulls in the second
+    ('XBTUSD', NULL_CASE_HOUR + datetime.timedelta(minutes=1), None, None, None),
+    ('XBTUSD', NULL_CASE_HOUR + datetime.timedelta(minutes=2), None, None, None),
+    ('XBTUSD', NULL_CASE_HOUR + datetime.timedelta(hours=1, minutes=1), 3, 0.5, None),
+    ('XBTUSD', NULL_CASE_HOUR + datetime.timedelta(hours=1, minutes=2), None, 1.5, None),
+    ('ETHUSD', NULL_CASE_HOUR + datetime.timedelta(minutes=5), 7, None, 2.5),
+]
+
+
+def aggregate_null_case(engine, report_engine):
+    if engine == 'spark':
+        return report_engine.aggregate_dataframe(report_engine.spark.createDataFrame(NULL_CASE_ROWS,
+                                                                                     NULL_CASE_SCHEMA))
+    from local_report_engine import HourlyAggregates
+    aggregates = HourlyAggregates(NULL_CASE_HOUR, 2)
+    symbols, timestamps, trades, home_notional, foreign_notional = zip(*NULL_CASE_ROWS)
+    aggregates.add(np.array(symbols, dtype=object), np.array(timestamps, dtype='datetime64[ms]'),
+                   *(np.array(column, dtype=np.float64) for column in (trades, home_notional, foreign_notional)))
+    return aggregates.to_records()
+
+
+def run_engine(engine, consul_host, consul_port, start_hour, current_hour):
+    os.environ['TZ'] = 'UTC'  # Spark returns naive timestamps in the Python process time zone
+    time.tzset()
+    start = time.perf_counter()
+    consul = ConsulServiceRegistry(consul_host=consul_host, consul_port=consul_port)
+    if engine == 'spark':
+        from spark_report_engine import SparkReportEngine
+        report_engine = SparkReportEngine(consul)
+    else:
+        from local_report_engine import LocalReportEngine
+        report_engine = LocalReportEngine(consul)
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    partials = report_engine.aggregate_hours(start_hour, current_hour)
+    reports = CryptoStatistics.derive_reports(pd.DataFrame(partials), current_hour)
+    runtime = time.perf_counter() - start
+    null_case = aggregate_null_case(engine, report_engine)
+
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if engine == 'spark':
+        peak_memory += peak_rss_mb(report_engine.spark.sparkContext._gateway.proc.pid)
+    report_engine.stop()
+    return {'startup': startup, 'runtime': runtime, 'peak_memory': peak_memory}, partials, reports, null_case
+
+
+def compare(name, expected, actual, keys):
+    expected = expected.sort_values(keys).reset_index(drop=True)
+    actual = actual.sort_values(keys).reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, check_exact=False, rtol=1e-9)
+    except AssertionError as e:
+        print(f"MISMATCH in {name}: {e}")
+        return False
+    return True
+
+
+def main(args):
+    current_hour = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start_hour = current_hour - datetime.timedelta(hours=args.hours)
+
+    results = {}
+    for engine in args.engines:
+        # A fresh process per engine, so startup and peak memory are not shared between them
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            results[engine] = executor.submit(run_engine, engine, args.consul_host, args.consul_port,
+                                              start_hour, current_hour).result()
+
+    print(f"{start_hour} - {current_hour} ({args.hours} closed hours)")
+    print(f"{'engine':>8} {'startup s':>10} {'runtime s':>10} {'peak MiB':>10} {'aggregates':>11}")
+    for engine, (metrics, partials, _, _) in results.items():
+        print(f"{engine:>8} {metrics['startup']:>10.2f} {metrics['runtime']:>10.2f} "
+              f"{metrics['peak_memory']:>10.0f} {len(partials):>11}")
+
+    if len(results) < 2:
+        return
+    (_, expected_partials, expected_reports, expected_null_case), \
+        (_, actual_partials, actual_reports, actual_null_case) = results.values()
+    matching = compare("hourly aggregates", pd.DataFrame(expected_partials), pd.DataFrame(actual_partials),
+                       ['symbol', 'hour'])
+    matching &= compare("hourly aggregates with null columns", pd.DataFrame(expected_null_case),
+                        pd.DataFrame(actual_null_case), ['symbol', 'hour'])
+    for name, expected in expected_reports.items():
+        keys = [column for column in ('symbol', 'hour') if column in expected.columns]
+        matching &= compare(name, expected, actual_reports[name], keys)
+    if not matching:
+        sys.exit(1)
+    print(f"Parity OK: aggregates, the null column case and all {len(expected_reports)} reports match")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consul-host', default='consul-server')
+    parser.add_argument('--consul-port', type=int, default=8500)
+    parser.add_argument('--hours', type=int, default=12)
+    parser.add_argument('--engines', nargs='+', choices=REPORT_ENGINES, default=list(REPORT_ENGINES))
+    main(parser.parse_args())
@@ -1,12 +1,15 @@
 import time
+import datetime
 import logging
-from pyspark.sql import SparkSession
-from pyspark.sql import functions as F
-from pymongo import MongoClient
+import os
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import OperationFailure
 from apscheduler.schedulers.background import BackgroundScheduler
 import pandas as pd
+from prometheus_client import Counter, Histogram, start_http_server
 
 from consul_service_registry import ConsulServiceRegistry
+from service_metrics import DURATION_BUCKETS
 
 pd.set_option('display.min_rows', 1000)
 pd.set_option('display.max_rows', 1000)
@@ -16,20 +19,44 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+REPORT_MODES = ('incremental', 'full')
+REPORT_ENGINES = ('spark', 'local')
+REPORT_HOURS = 12  # The longest report (hourly_trades_volume) covers the last 12 closed hours
+REPORT_COLLECTIONS = (
+    'hourly_transactions',
+    'total_volume_foreignNotional',
+    'hourly_trades_volume_foreignNotional',
+    'total_volume_homeNotional',
+    'hourly_trades_volume_homeNotional'
+)
+SYMBOL_REPORT_COLLECTIONS = ('hourly_transactions', 'total_volume_foreignNotional', 'total_volume_homeNotional')
+REPORT_STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+REPORT_STAGE_DURATION = Histogram('report_stage_duration_seconds', "Duration of the stages of a report computation",
+                                  ['engine', 'stage'], buckets=REPORT_STAGE_BUCKETS)
+REPORT_RUNS = Counter('report_runs_total', "Report computations by result", ['result'])
+MONGO_WRITE_DURATION = Histogram('mongo_write_duration_seconds', "Duration of MongoDB writes", ['collection'],
+                                 buckets=DURATION_BUCKETS)
+
 
 class CryptoStatistics:
     def __init__(self, consul):
         self.consul = consul
-        self.spark = SparkSession.builder \
-            .appName("CryptoStatistics") \
-            .config("spark.master", self.consul.get_config("spark/master")) \
-            .config('spark.jars.packages', "com.datastax.spark:spark-cassandra-connector_2.12:3.5.0") \
-            .config("spark.cassandra.connection.host", self.consul.get_config("cassandra/contact_point")) \
-            .config("spark.sql.session.timeZone", "UTC") \
-            .getOrCreate()
+        self.engine = self.consul.get_config("report/engine") or 'spark'
+        self.report_engine = self.create_report_engine(self.engine)
 
         self.client = MongoClient(self.consul.get_config("mongodb/uri"))
         self.db = self.client[self.consul.get_config("mongodb/database")]
+        self.create_report_indexes(int(self.consul.get_config("mongodb/report_retention_days") or 30))
+
+        self.report_mode = self.consul.get_config("spark/report_mode") or 'incremental'
+        if self.report_mode not in REPORT_MODES:
+            raise ValueError(f"Invalid report mode: {self.report_mode}")
+        self.hourly_partial_aggregates = self.db['hourly_partial_aggregates']
+        self.hourly_partial_aggregates.create_index([('hour', 1), ('symbol', 1)], unique=True)
+        self.computed_hours = self.db['hourly_partial_aggregates_computed_hours']
+        self.computed_hours.create_index([('hour', 1)], unique=True)
+        # The latest closed hours are re-aggregated on every run, for rows written late, backfilled or replayed
+        self.partial_aggregate_grace_hours = int(self.consul.get_config("report/partial_aggregate_grace_hours") or 2)
 
         self.compute_and_save_statistics()  # Compute and save statistics for the first time
         self.scheduler = BackgroundScheduler()
@@ -39,86 +66,141 @@ class CryptoStatistics:
 
         self.scheduler.start()
 
+    def create_report_indexes(self, retention_days):
+        """Descending report_date index per report (latest-report lookup and TTL retention) and history indexes."""
+        expire_after_seconds = retention_days * 24 * 3600
+        for name in REPORT_COLLECTIONS:
+            try:
+                self.db[name].create_index([('report_date', -1)], expireAfterSeconds=expire_after_seconds)
+            except OperationFailure:
+                # The index exists with another retention period
+                self.db.command('collMod', name, index={'keyPattern': {'report_date': -1},
+                                                        'expireAfterSeconds': expire_after_seconds})
+        # Historical queries by symbol, for the columnar and the legacy row layout
+        for name in SYMBOL_REPORT_COLLECTIONS:
+            self.db[name].create_index([('columns.symbol', 1), ('report_date', 1)])
+            self.db[name].create_index([('data.symbol', 1), ('report_date', 1)])
+
+    def create_report_engine(self, engine):
+        if engine not in REPORT_ENGINES:
+            raise ValueError(f"Invalid report engine: {engine}")
+        # Imported lazily, so the local engine never pays for pyspark and the JVM
+        if engine == 'spark':
+            from spark_report_engine import SparkReportEngine
+            return SparkReportEngine(self.consul)
+        from local_report_engine import LocalReportEngine
+        return LocalReportEngine(self.consul)
+
+    def stage(self, name):
+        return REPORT_STAGE_DURATION.labels(self.engine, name).time()
+
     def compute_and_save_statistics(self):
-        df = self.load_data_from_cassandra()
-
-        result = {
-            "hourly_transactions": self.compute_hourly_transactions(df),
-            "total_volume_foreignNotional": self.compute_total_volume(df, "foreignNotional"),
-            "hourly_trades_volume_foreignNotional": self.compute_hourly_trades_volume(df, "foreignNotional"),
-            "total_volume_homeNotional": self.compute_total_volume(df, "homeNotional"),
-            "hourly_trades_volume_homeNotional": self.compute_hourly_trades_volume(df, "homeNotional")
+        try:
+            with self.stage('total'):
+                self.compute_and_save_reports()
+            REPORT_RUNS.labels('ok').inc()
+        except Exception:
+            REPORT_RUNS.labels('error').inc()
+            raise
+
+    def compute_and_save_reports(self):
+        current_hour = datetime.datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        start_hour = current_hour - datetime.timedelta(hours=REPORT_HOURS)
+
+        if self.report_mode == 'incremental':
+            self.update_hourly_partial_aggregates(start_hour, current_hour)
+            with self.stage('load_partials'):
+                partials = pd.DataFrame(list(self.hourly_partial_aggregates.find(
+                    {'hour': {'$gte': start_hour, '$lt': current_hour}}, {'_id': 0})))
+        else:
+            # One (symbol, hour) aggregation - a single scan and shuffle - feeds all five reports
+            with self.stage('aggregate'):
+                partials = pd.DataFrame(self.report_engine.aggregate_hours(start_hour, current_hour))
+        with self.stage('derive'):
+            result = self.derive_reports(partials, current_hour)
+
+        with self.stage('save'):
+            self.save_to_mongodb(result)
+
+    def update_hourly_partial_aggregates(self, start_hour, current_hour):
+        """Aggregate and persist the closed hours of the report window that were not aggregated yet, and always
+        the last partial_aggregate_grace_hours closed hours; older hours are frozen once aggregated.
+
+        Hours before the report window are no longer read and are deleted.
+        """
+        grace_start = current_hour - datetime.timedelta(hours=self.partial_aggregate_grace_hours)
+        computed = set(self.computed_hours.distinct('hour', {'hour': {'$gte': start_hour, '$lt': grace_start}}))
+        missing = [
+            start_hour + datetime.timedelta(hours=i) for i in range(REPORT_HOURS)
+            if start_hour + datetime.timedelta(hours=i) not in computed
+        ]
+        with MONGO_WRITE_DURATION.labels('hourly_partial_aggregates').time():
+            self.hourly_partial_aggregates.delete_many({'hour': {'$lt': start_hour}})
+            self.computed_hours.delete_many({'hour': {'$lt': start_hour}})
+        if not missing:
+            return
+
+        with self.stage('aggregate'):
+            rows = self.report_engine.aggregate_hours(missing[0], current_hour)
+        missing = set(missing)
+        updates = [ReplaceOne({'hour': row['hour'], 'symbol': row['symbol']}, row, upsert=True)
+                   for row in rows if row['hour'] in missing]
+        with MONGO_WRITE_DURATION.labels('hourly_partial_aggregates').time():
+            if updates:
+                self.hourly_partial_aggregates.bulk_write(updates, ordered=False)
+            self.computed_hours.bulk_write([ReplaceOne({'hour': hour}, {'hour': hour}, upsert=True) for hour in missing],
+                                           ordered=False)
+        logger.info(f"Aggregated {len(missing)} closed hours starting from {min(missing)}")
+
+    @staticmethod
+    def derive_reports(partials, current_hour):
+        """Build the five reports from (symbol, hour) aggregates of the last REPORT_HOURS closed hours."""
+        if partials.empty:
+            partials = pd.DataFrame(columns=['symbol', 'hour', 'trades', 'homeNotional', 'foreignNotional'])
+        partials = partials.assign(hour_of_day=pd.to_datetime(partials['hour']).dt.hour)
+        last_6_hours = partials[partials['hour'] >= current_hour - datetime.timedelta(hours=6)]
+
+        def total_volume(volume_type):
+            return last_6_hours.groupby('symbol', as_index=False) \
+                .agg(total_volume=(volume_type, 'sum')) \
+                .sort_values('total_volume', ascending=False)
+
+        def hourly_trades_volume(volume_type):
+            return partials.groupby('hour_of_day', as_index=False) \
+                .agg(trade_count=('trades', 'sum'), total_volume=(volume_type, 'sum')) \
+                .rename(columns={'hour_of_day': 'hour'}) \
+                .sort_values('trade_count', ascending=False)
+
+        hourly_transactions = last_6_hours.groupby(['symbol', 'hour_of_day'], as_index=False) \
+            .agg(transaction_count=('trades', 'sum')) \
+            .rename(columns={'hour_of_day': 'hour'}) \
+            .sort_values('transaction_count', ascending=False)
+
+        return {
+            "hourly_transactions": hourly_transactions,
+            "total_volume_foreignNotional": total_volume("foreignNotional"),
+            "hourly_trades_volume_foreignNotional": hourly_trades_volume("foreignNotional"),
+            "total_volume_homeNotional": total_volume("homeNotional"),
+            "hourly_trades_volume_homeNotional": hourly_trades_volume("homeNotional")
         }
 
-        self.save_to_mongodb(result)
-
-    def load_data_from_cassandra(self):
-        df = self.spark.read \
-            .format("org.apache.spark.sql.cassandra") \
-            .options(table="tradebin1m", keyspace=consul.get_config("cassandra/keyspace")) \
-            .load()
-        return df
-
-    def compute_hourly_transactions(self, df):
-        hourly_transactions = df \
-            .withColumn("hour", F.hour("timestamp")) \
-            .groupBy("symbol", "hour") \
-            .agg(F.sum("trades").alias("transaction_count")) \
-            .filter(
-            (F.col("hour") >= F.hour(F.current_timestamp()) - 6)
-            & (F.col("hour") != F.hour(F.current_timestamp()))
-        ).sort(
-            F.col("transaction_count").desc()
-        ).toPandas()
-        return hourly_transactions
-
-    def compute_total_volume(self, df, volume_type="foreignnotional"):
-        start_hour = F.date_trunc("hour", F.current_timestamp() - F.expr("INTERVAL 6 HOURS"))
-
-        df_filtered = df.filter(
-            (F.date_trunc("hour", F.col("timestamp")) >= start_hour)
-            & (F.date_trunc("hour", F.col("timestamp")) < F.date_trunc("hour", F.current_timestamp()))
-        )
-
-        # Calculate total trading volume for each symbol
-        total_volume = df_filtered \
-            .groupBy("symbol") \
-            .agg(F.sum(volume_type).alias("total_volume")) \
-            .sort(  # by total_volume
-            F.col("total_volume").desc()
-        ).toPandas()
-
-        return total_volume
-
-    def compute_hourly_trades_volume(self, df, volume_type="foreignnotional"):
-        start_hour = F.date_trunc("hour", F.current_timestamp() - F.expr("INTERVAL 12 HOURS"))
-
-        hourly_trades_volume = df \
-            .withColumn("hour", F.hour("timestamp")) \
-            .filter((F.col("timestamp") >= start_hour)
-                    & (F.col("hour") != F.hour(F.current_timestamp()))
-                    ) \
-            .groupBy("hour") \
-            .agg(F.sum("trades").alias("trade_count"), F.sum(volume_type).alias("total_volume")) \
-            .sort(F.col("trade_count").desc()).toPandas()
-        return hourly_trades_volume
-
     def save_to_mongodb(self, result):
         for key, value in result.items():
             collection = self.db[key]
+            # Column-oriented: every column name is stored once instead of once per row
             data = {
                 "report_date": pd.Timestamp.utcnow(),
-                "data": value.to_dict(orient='records')
+                "row_count": len(value),
+                "columns": value.to_dict(orient='list')
             }
 
-            logger.debug(f"Result for {key}:")
-            logger.debug(data)
-
-            collection.insert_one(data)
+            with MONGO_WRITE_DURATION.labels(key).time():
+                collection.insert_one(data)
+            logger.info(f"Saved {key} ({len(value)} rows)")
 
     def __del__(self):
         try:
-            self.spark.stop()
+            self.report_engine.stop()
             self.scheduler.shutdown()
             self.client.close()
             self.consul.deregister_service()
@@ -129,6 +211,7 @@ class CryptoStatistics:
 if __name__ == "__main__":
     consul = ConsulServiceRegistry(consul_host="consul-server",
                                    consul_port=8500)
+    start_http_server(int(os.environ.get("SERVICE_PORT") or 8001))
     crypto_statistics = CryptoStatistics(consul=consul)
     try:
         while True:
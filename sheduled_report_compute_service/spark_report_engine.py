@@ -0,0 +1,51 @@
+import logging
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+class SparkReportEngine:
+    """Hourly (symbol, hour) aggregates of tradeBin1m computed on the Spark cluster."""
+
+    def __init__(self, consul):
+        self.consul = consul
+        self.spark = SparkSession.builder \
+            .appName("CryptoStatistics") \
+            .config("spark.master", self.consul.get_config("spark/master")) \
+            .config('spark.jars.packages', "com.datastax.spark:spark-cassandra-connector_2.12:3.5.0") \
+            .config("spark.cassandra.connection.host", self.consul.get_config("cassandra/contact_point")) \
+            .config("spark.sql.session.timeZone", "UTC") \
+            .getOrCreate()
+
+    def load_data_from_cassandra(self, start_timestamp=None, end_timestamp=None):
+        df = self.spark.read \
+            .format("org.apache.spark.sql.cassandra") \
+            .options(table="tradebin1m", keyspace=self.consul.get_config("cassandra/keyspace")) \
+            .load()
+        # Range predicates on the clustering column are pushed down to Cassandra by the connector
+        if start_timestamp is not None:
+            df = df.filter(F.col("timestamp") >= F.lit(start_timestamp))
+        if end_timestamp is not None:
+            df = df.filter(F.col("timestamp") < F.lit(end_timestamp))
+        return df
+
+    def aggregate_hours(self, start_timestamp, end_timestamp):
+        return self.aggregate_dataframe(self.load_data_from_cassandra(start_timestamp, end_timestamp))
+
+    @staticmethod
+    def aggregate_dataframe(df):
+        """Sum trades and notionals per (symbol, hour) in one aggregation."""
+        return [row.asDict() for row in df
+                .groupBy("symbol", F.date_trunc("hour", F.col("timestamp")).alias("hour"))
+                .agg(F.sum("trades").alias("trades"),
+                     F.sum("homeNotional").alias("homeNotional"),
+                     F.sum("foreignNotional").alias("foreignNotional"))
+                .collect()]
+
+    def stop(self):
+        self.spark.stop()
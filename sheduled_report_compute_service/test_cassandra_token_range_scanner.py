@@ -0,0 +1,149 @@
+"""Tests of the token-range scanner against an in-memory stand-in for the Cassandra session.
+
+The workers are real spawned processes; fake_connect gives each one a FakeSession over the rows in the
+connection settings, which pages through the rows whose token lies in the requested range.
+
+    python -m pytest test_cassandra_token_range_scanner.py
+"""
+import os
+import time
+from multiprocessing import get_context
+
+import numpy as np
+import pytest
+
+from cassandra_token_range_scanner import MAX_TOKEN, MIN_TOKEN, TokenRangeScanner, split_token_ring
+
+COLUMNS = {'symbol': object, 'trades': np.int64}
+
+
+class FakeStatement:
+    def __init__(self, query):
+        self.query = query
+        self.fetch_size = None
+
+
+class FakeResult:
+    def __init__(self, rows, fetch_size, pages_fetched):
+        self.rows = rows
+        self.fetch_size = fetch_size
+        self.pages_fetched = pages_fetched
+        self.offset = 0
+        self.current_rows = []
+        self.fetch_next_page()
+
+    @property
+    def has_more_pages(self):
+        return self.offset < len(self.rows)
+
+    def fetch_next_page(self):
+        self.current_rows = self.rows[self.offset:self.offset + self.fetch_size]
+        self.offset += self.fetch_size
+        if self.pages_fetched is not None:
+            with self.pages_fetched.get_lock():
+                self.pages_fetched.value += 1
+
+
+class FakeSession:
+    def __init__(self, connection):
+        self.rows = connection['rows']  # (token, symbol, trades)
+        self.fail_token = connection.get('fail_token')
+        self.crash_token = connection.get('crash_token')
+        self.stall = connection.get('stall', False)
+        self.pages_fetched = connection.get('pages_fetched')
+
+    def execute(self, statement, parameters):
+        start, end = parameters[:2]
+        if self.fail_token is not None and start < self.fail_token <= end:
+            raise ValueError("read timeout")
+        if self.crash_token is not None and start < self.crash_token <= end:
+            os._exit(137)  # Like a worker killed for memory, without reporting anything
+        if self.stall:
+            time.sleep(3600)
+        rows = [row[1:] for row in self.rows if start < row[0] <= end]
+        return FakeResult(rows, statement.fetch_size, self.pages_fetched)
+
+
+def fake_connect(connection, query, fetch_size):
+    if connection.get('unreachable'):
+        raise ConnectionError("no hosts available")
+    statement = FakeStatement(query)
+    statement.fetch_size = fetch_size
+    return FakeSession(connection), statement
+
+
+def sample_rows(count):
+    step = (MAX_TOKEN - MIN_TOKEN) // count
+    return [(MIN_TOKEN + 1 + step * i, f"SYM{i % 7}", i) for i in range(count)]
+
+
+def scanner(connection, **kwargs):
+    return TokenRangeScanner(connection, "tradeBin1m", COLUMNS, "symbol", connect=fake_connect, **kwargs)
+
+
+def test_split_token_ring_covers_the_ring_without_gaps():
+    ranges = split_token_ring(7)
+    assert len(ranges) == 7
+    assert ranges[0][0] == MIN_TOKEN and ranges[-1][1] == MAX_TOKEN
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+    assert all(start < end for start, end in ranges)
+
+
+def test_query_restricts_token_range_and_extra_predicate():
+    query = scanner({'rows': []}, where="timestamp >= ?").query
+    assert query == "SELECT symbol, trades FROM tradeBin1m WHERE token(symbol) > ? AND token(symbol) <= ? " \
+                    "AND timestamp >= ? ALLOW FILTERING"
+
+
+def test_scan_yields_every_row_once_as_columnar_chunks():
+    rows = sample_rows(1000)
+    chunks = list(scanner({'rows': rows}, split_count=16, processes=2, fetch_size=30).scan())
+
+    assert all(len(chunk['symbol']) <= 30 for chunk in chunks)
+    assert all(chunk['trades'].dtype == np.int64 for chunk in chunks)
+    trades = np.concatenate([chunk['trades'] for chunk in chunks])
+    symbols = np.concatenate([chunk['symbol'] for chunk in chunks])
+    assert sorted(zip(trades.tolist(), symbols.tolist())) == [(trades, symbol) for _, symbol, trades in rows]
+
+
+def test_in_flight_chunks_are_bounded_while_the_consumer_is_slow():
+    pages_fetched = get_context('spawn').Value('i', 0)
+    max_in_flight_chunks, processes = 2, 2
+    scan = scanner({'rows': sample_rows(2000), 'pages_fetched': pages_fetched}, split_count=8,
+                   processes=processes, fetch_size=10, max_in_flight_chunks=max_in_flight_chunks).scan()
+
+    consumed = rows = 0
+    for chunk in scan:
+        consumed += 1
+        rows += len(chunk['symbol'])
+        if consumed == 1:
+            time.sleep(2)  # The workers fill the queue and block on it
+            # Pages in the queue plus at most one built (and waiting to be put) per worker
+            assert pages_fetched.value - consumed <= max_in_flight_chunks + processes
+    assert rows == 2000
+
+
+def test_worker_error_is_raised_in_the_caller():
+    rows = sample_rows(100)
+    with pytest.raises(RuntimeError, match="read timeout"):
+        list(scanner({'rows': rows, 'fail_token': rows[50][0]}, split_count=4, processes=2).scan())
+
+
+def test_worker_connection_error_is_raised_in_the_caller():
+    with pytest.raises(RuntimeError, match="no hosts available"):
+        list(scanner({'rows': [], 'unreachable': True}, split_count=4, processes=2).scan())
+
+
+def test_dead_worker_fails_the_scan_instead_of_hanging():
+    rows = sample_rows(100)
+    start = time.monotonic()
+    with pytest.raises(RuntimeError, match="exit code 137"):
+        list(scanner({'rows': rows, 'crash_token': rows[50][0]}, split_count=4, processes=2).scan())
+    assert time.monotonic() - start < 30
+
+
+def test_scan_timeout_raises_and_terminates_the_workers():
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        list(scanner({'rows': sample_rows(10), 'stall': True}, split_count=4, processes=2, timeout=2).scan())
+    assert time.monotonic() - start < 30
@@ -0,0 +1,70 @@
+import datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+
+class TradeBin1mRow(NamedTuple):
+    """tradeBin1m row in the column order of the tradeBin1m INSERT."""
+    timestamp: datetime.datetime
+    symbol: str
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    close: Optional[float]
+    trades: int
+    volume: float
+    lastSize: Optional[float]
+    turnover: float
+    homeNotional: Optional[float]
+    foreignNotional: Optional[float]
+
+
+class QuoteRow(NamedTuple):
+    """quote row in the column order of the quote INSERT."""
+    timestamp: datetime.datetime
+    symbol: str
+    bidSize: Optional[int]
+    bidPrice: Optional[float]
+    askPrice: Optional[float]
+    askSize: Optional[int]
+
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value):
+    """Parse a Bitmex timestamp ('2024-05-06T17:20:00.000Z') into an aware UTC datetime.
+
+    Bitmex always sends this fixed format, so the fields are sliced directly; anything else
+    goes through datetime.fromisoformat. Quotes of one burst share timestamps, hence the cache.
+    """
+    if len(value) == 24 and value[10] == 'T' and value[23] == 'Z':
+        return datetime.datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                                 int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                                 int(value[20:23]) * 1000, tzinfo=datetime.timezone.utc)
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def is_index_symbol(symbol):
+    # Index values (e.g. '.BXBT') are not cryptocurrencies, no need to store them
+    return symbol[0] == '.'
+
+
+def decode_tradeBin1m(data):
+    return [
+        TradeBin1mRow(parse_timestamp(trade['timestamp']), trade['symbol'], trade['open'], trade['high'],
+                      trade['low'], trade['close'], trade['trades'], trade['volume'], trade.get('lastSize', 0),
+                      trade['turnover'], trade['homeNotional'], trade['foreignNotional'])
+        for trade in data
+        if not is_index_symbol(trade['symbol'])
+    ]
+
+
+def decode_quote(data):
+    return [
+        QuoteRow(parse_timestamp(quote['timestamp']), quote['symbol'], quote['bidSize'], quote['bidPrice'],
+                 quote['askPrice'], quote['askSize'])
+        for quote in data
+        if not is_index_symbol(quote['symbol'])
+    ]
@@ -0,0 +1,91 @@
+"""Micro-benchmark of bitmex_message_decoder against the previous pandas.Timestamp row loop.
+
+Frames are read from a recording made with `ws_live_data_replay.py record`; without
+a recording, synthetic tradeBin1m and quote frames are used.
+
+Example:
+    python bitmex_message_decoder_benchmark.py --frames recorded_frames.ndjson.gz --repeat 5
+"""
+import argparse
+import time
+
+import ujson as json
+
+from bitmex_message_decoder import decode_tradeBin1m, decode_quote, parse_timestamp
+from ws_live_data_replay import load_recording
+
+
+def generate_frames(count=10000, symbols=50):
+    frames = []
+    for i in range(count):
+        timestamp = f"2024-05-06T17:{i // 60 % 60:02d}:{i % 60:02d}.{i % 1000:03d}Z"
+        if i % 10 == 0:
+            data = [{'timestamp': timestamp, 'symbol': f"SYM{s}USD", 'open': 1.0, 'high': 2.0, 'low': 0.5,
+                     'close': 1.5, 'trades': 10, 'volume': 100, 'lastSize': 1, 'turnover': 1000,
+                     'homeNotional': 1.5, 'foreignNotional': 150.0} for s in range(symbols)]
+            data.append(dict(data[0], symbol='.BXBT'))
+            frames.append(json.dumps({'table': 'tradeBin1m', 'action': 'insert', 'data': data}))
+        else:
+            data = [{'timestamp': timestamp, 'symbol': 'XBTUSD', 'bidSize': 100, 'bidPrice': 63000.5,
+                     'askPrice': 63001.0, 'askSize': 200}]
+            frames.append(json.dumps({'table': 'quote', 'action': 'insert', 'data': data}))
+    return frames
+
+
+def legacy_decode(frame):
+    import pandas as pd
+
+    message = json.loads(frame)
+    rows = []
+    if message.get('table') == 'tradeBin1m':
+        for trade in message.get('data', []):
+            if trade['symbol'][0] == '.':
+                continue
+            rows.append((pd.Timestamp(trade['timestamp']).to_pydatetime(), trade['symbol'], trade['open'],
+                         trade['high'], trade['low'], trade['close'], trade['trades'], trade['volume'],
+                         trade.get('lastSize', 0), trade['turnover'], trade['homeNotional'], trade['foreignNotional']))
+    elif message.get('table') == 'quote':
+        for quote in message.get('data', []):
+            rows.append((pd.Timestamp(quote['timestamp']).to_pydatetime(), quote['symbol'], quote['bidSize'],
+                         quote['bidPrice'], quote['askPrice'], quote['askSize']))
+    return rows
+
+
+def fast_decode(frame):
+    message = json.loads(frame)
+    if message.get('table') == 'tradeBin1m':
+        return decode_tradeBin1m(message.get('data', []))
+    if message.get('table') == 'quote':
+        return decode_quote(message.get('data', []))
+    return []
+
+
+def measure(decode, frames, repeat):
+    best = float('inf')
+    rows = 0
+    for _ in range(repeat):
+        parse_timestamp.cache_clear()
+        start = time.perf_counter()
+        rows = sum(len(decode(frame)) for frame in frames)
+        best = min(best, time.perf_counter() - start)
+    return rows, best
+
+
+def main(args):
+    start = time.perf_counter()
+    import pandas  # noqa: F401 - measure the import cost the legacy path pays at startup
+    pandas_import = time.perf_counter() - start
+
+    frames = [frame for _, frame in load_recording(args.frames)] if args.frames else generate_frames()
+    print(f"{len(frames)} frames, best of {args.repeat}, pandas import {pandas_import * 1000:.0f} ms")
+    for name, decode in (('pandas.Timestamp', legacy_decode), ('bitmex_message_decoder', fast_decode)):
+        rows, elapsed = measure(decode, frames, args.repeat)
+        print(f"{name:>24}: {elapsed * 1000:8.1f} ms, {rows / elapsed:12.0f} rows/sec, "
+              f"{elapsed / len(frames) * 1e6:6.2f} us/frame")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', help="Recorded frames (.ndjson.gz)")
+    parser.add_argument('--repeat', type=int, default=3)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+"""Rebuild the tradeBin1m_rollup table from existing tradeBin1m rows.
+
+Reads tradeBin1m for the given time range with a token-range parallel scan (bounded memory) and
+upserts the rows into their hourly rollup partitions, so running it again over the same range is safe.
+
+Example:
+    python tradeBin1m_rollup_backfill.py --from 2024-05-01T00:00 --to 2024-05-07T00:00 --consul-host localhost
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+
+from cassandra_token_range_scanner import TokenRangeScanner, connection_from_consul
+from consul_service_registry import ConsulServiceRegistry
+from ws_live_data_retrieve_repository import WSLiveDataRetrieveRepository
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+ROLLUP_SOURCE_COLUMNS = {
+    'timestamp': 'datetime64[ms]',
+    'symbol': object,
+    'trades': object,  # object keeps nulls as None instead of forcing a float
+    'volume': object,
+    'homeNotional': object,
+    'foreignNotional': object
+}
+
+
+async def backfill(repository, scanner, start_timestamp, end_timestamp):
+    write_engine = repository.write_engine
+    total = 0
+    for chunk in scanner.scan((start_timestamp, end_timestamp)):
+        timestamps = chunk['timestamp'].tolist()
+        hours = chunk['timestamp'].astype('datetime64[h]').astype('datetime64[ms]').tolist()
+        rows = list(zip(hours, timestamps, chunk['symbol'], chunk['trades'], chunk['volume'],
+                        chunk['homeNotional'], chunk['foreignNotional']))
+        await write_engine.write(write_engine.tradeBin1m_rollup_statement, rows, partition_key_index=0)
+        total += len(rows)
+        logger.info(f"Backfilled {total} rows so far")
+    return total
+
+
+def main(args):
+    end_timestamp = datetime.datetime.fromisoformat(args.to) if args.to else datetime.datetime.utcnow()
+    start_timestamp = datetime.datetime.fromisoformat(args.start) if args.start \
+        else end_timestamp - datetime.timedelta(days=1)
+
+    consul = ConsulServiceRegistry(consul_host=args.consul_host, consul_port=args.consul_port)
+    repository = WSLiveDataRetrieveRepository(consul)
+    scanner = TokenRangeScanner(connection_from_consul(consul), "tradeBin1m", ROLLUP_SOURCE_COLUMNS,
+                                partition_key="symbol", where="timestamp >= ? AND timestamp < ?",
+                                split_count=args.splits, processes=args.processes)
+    total = asyncio.run(backfill(repository, scanner, start_timestamp, end_timestamp))
+    logger.info(f"Backfilled {total} rows from {start_timestamp} to {end_timestamp} into tradeBin1m_rollup")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--from', dest='start', help="Start (UTC, ISO format), defaults to 24 hours before --to")
+    parser.add_argument('--to', help="End (UTC, ISO format, exclusive), defaults to now")
+    parser.add_argument('--consul-host', default='consul-server')
+    parser.add_argument('--consul-port', type=int, default=8500)
+    parser.add_argument('--splits', type=int, default=64)
+    parser.add_argument('--processes', type=int, default=4)
+    main(parser.parse_args())
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from prometheus_client import Counter, Histogram
+
+from service_metrics import DURATION_BUCKETS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+OVERFLOW_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+LATENCY_STAGES = ('frame_wait', 'parse', 'write_wait', 'write', 'end_to_end')
+INGEST_ROWS = Counter('ingest_rows_total', "Rows written by the ingest pipeline", ['table'])
+WRITE_DURATION = Histogram('ingest_write_duration_seconds', "Duration of one write job (Cassandra)", ['table'],
+                           buckets=DURATION_BUCKETS)
+INGEST_LAG = Histogram('ingest_lag_seconds', "Time from receiving a frame to its rows being written", ['table'],
+                       buckets=DURATION_BUCKETS)
+
+
+class IngestQueue:
+    """Bounded asyncio queue that applies an overflow policy when it is full.
+
+    'block'       - the producer waits until there is space (backpressure)
+    'drop_newest' - the item being added is discarded
+    'drop_oldest' - the oldest queued item is discarded to make space
+    """
+
+    def __init__(self, name, maxsize, overflow_policy='block'):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy for {name}: {overflow_policy}")
+        self.name = name
+        self.overflow_policy = overflow_policy
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    async def put(self, item):
+        if self.queue.full():
+            if self.overflow_policy == 'drop_newest':
+                self.dropped += 1
+                return False
+            if self.overflow_policy == 'drop_oldest':
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+
+        await self.queue.put(item)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    async def get(self):
+        return await self.queue.get()
+
+    def task_done(self):
+        self.queue.task_done()
+
+    async def join(self):
+        await self.queue.join()
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        return {
+            'depth': self.depth(),
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'overflow_policy': self.overflow_policy
+        }
+
+
+class IngestPipeline:
+    """Staged ingest pipeline: receiver -> parser -> per-table writers.
+
+    The receiver only enqueues raw frames. Parser tasks decode them and submit write jobs
+    into a separate queue per table, so a burst on one table (e.g. quote) can't delay
+    persistence of another (e.g. tradeBin1m).
+    """
+
+    def __init__(self, parse_frame, frame_queue_size=10000, frame_overflow_policy='block',
+                 write_queue_size=1000, write_overflow_policies=None, writer_concurrency=4,
+                 parser_count=1, stats_interval=60, latency_samples=0):
+        self.parse_frame = parse_frame
+        self.frames = IngestQueue('frames', frame_queue_size, frame_overflow_policy)
+        self.write_queue_size = write_queue_size
+        self.write_overflow_policies = write_overflow_policies or {}
+        self.writer_concurrency = writer_concurrency
+        self.parser_count = parser_count
+        self.stats_interval = stats_interval
+
+        self.write_queues = {}
+        self.table_counters = {}
+        self.tasks = []
+        self.parse_errors = 0
+        self.running = False
+        # Per-stage latency samples (seconds), only kept when latency_samples > 0
+        self.latencies = {stage: deque(maxlen=latency_samples) for stage in LATENCY_STAGES} if latency_samples else None
+
+    async def start(self):
+        self.running = True
+        for _ in range(self.parser_count):
+            self.tasks.append(asyncio.create_task(self._parser()))
+        if self.stats_interval:
+            self.tasks.append(asyncio.create_task(self._report_stats()))
+
+    async def stop(self, drain=True, timeout=None):
+        """Stop the parser and writer tasks, after waiting up to timeout seconds (None: no limit) for the queues
+        to drain if drain is set. Frames and write jobs still queued are then counted as dropped."""
+        if drain:
+            try:
+                await asyncio.wait_for(self.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Ingest queues not drained within {timeout} s")
+        self.running = False
+        for ingest_queue in [self.frames, *self.write_queues.values()]:
+            if ingest_queue.depth():
+                logger.error(f"Dropping {ingest_queue.depth()} queued {ingest_queue.name} items")
+                ingest_queue.dropped += ingest_queue.depth()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def join(self):
+        """Wait until every received frame has been parsed and every write job completed."""
+        await self.frames.join()
+        for write_queue in list(self.write_queues.values()):
+            await write_queue.join()
+
+    async def put_frame(self, raw_frame):
+        return await self.frames.put((time.monotonic(), raw_frame))
+
+    async def submit(self, table, write, *args, received_at=None):
+        """Queue a write job for the given table; write(*args) is awaited by a writer task."""
+        write_queue = self.write_queues.get(table)
+        if write_queue is None:
+            write_queue = self._create_write_queue(table)
+        return await write_queue.put((received_at or time.monotonic(), time.monotonic(), write, args))
+
+    def _create_write_queue(self, table):
+        write_queue = IngestQueue(table, self.write_queue_size,
+                                  self.write_overflow_policies.get(table, 'block'))
+        self.write_queues[table] = write_queue
+        self.table_counters[table] = {'written': 0, 'write_errors': 0, 'last_lag': 0.0, 'max_lag': 0.0}
+        for _ in range(self.writer_concurrency):
+            self.tasks.append(asyncio.create_task(self._writer(table, write_queue)))
+        return write_queue
+
+    async def _parser(self):
+        while self.running:
+            received_at, raw_frame = await self.frames.get()
+            parse_started = time.monotonic()
+            try:
+                await self.parse_frame(raw_frame, received_at)
+            except Exception as err:
+                self.parse_errors += 1
+                logger.error(f"Error parsing frame: {err}")
+            finally:
+                if self.latencies is not None:
+                    self.latencies['frame_wait'].append(parse_started - received_at)
+                    self.latencies['parse'].append(time.monotonic() - parse_started)
+                self.frames.task_done()
+
+    async def _writer(self, table, write_queue):
+        counters = self.table_counters[table]
+        while self.running:
+            received_at, submitted_at, write, args = await write_queue.get()
+            write_started = time.monotonic()
+            try:
+                await write(*args)
+                counters['written'] += 1
+                INGEST_ROWS.labels(table).inc(len(args[0]) if args else 0)
+            except Exception as err:
+                counters['write_errors'] += 1
+                logger.error(f"Error writing {table}: {err}")
+            finally:
+                write_finished = time.monotonic()
+                lag = write_finished - received_at
+                counters['last_lag'] = lag
+                counters['max_lag'] = max(counters['max_lag'], lag)
+                WRITE_DURATION.labels(table).observe(write_finished - write_started)
+                INGEST_LAG.labels(table).observe(lag)
+                if self.latencies is not None:
+                    self.latencies['write_wait'].append(write_started - submitted_at)
+                    self.latencies['write'].append(write_finished - write_started)
+                    self.latencies['end_to_end'].append(lag)
+                write_queue.task_done()
+
+    async def _report_stats(self):
+        while self.running:
+            await asyncio.sleep(self.stats_interval)
+            logger.info(f"Ingest pipeline stats: {self.stats()}")
+
+    def stats(self):
+        return {
+            'frames': self.frames.stats(),
+            'parse_errors': self.parse_errors,
+            'tables': {
+                table: {**write_queue.stats(), **self.table_counters[table]}
+                for table, write_queue in self.write_queues.items()
+            }
+        }
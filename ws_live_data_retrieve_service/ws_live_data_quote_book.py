@@ -0,0 +1,91 @@
+import asyncio
+import json
+import logging
+import time
+
+from ws_live_data_update_feed import to_milliseconds
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+def quote_record(row, received_at, confirmed_at):
+    """Latest quote of a symbol as published to Hazelcast; timestamps are epoch milliseconds.
+
+    confirmed_at is when the book last published the quote as current, also when it did not change.
+    """
+    return {
+        'bidPrice': row.bidPrice,
+        'askPrice': row.askPrice,
+        'bidSize': row.bidSize,
+        'askSize': row.askSize,
+        'timestamp': to_milliseconds(row.timestamp),
+        'received_at': int(received_at * 1000),
+        'confirmed_at': int(confirmed_at * 1000)
+    }
+
+
+class LatestQuoteBook:
+    """Latest quote per symbol, published to a Hazelcast ReplicatedMap for the live data retrieve services.
+
+    Every decoded quote frame updates the book in memory; the symbols that changed are written to the
+    map at most once per publish_interval with a single put_all, so a burst of quotes for one symbol
+    costs one map update. The same coalesced quotes go to the live update feed, if there is one.
+    Every heartbeat_interval seconds all quotes are written again with a new confirmed_at, so readers can
+    tell an unchanged quote of an illiquid symbol from a book that is no longer published.
+    """
+
+    def __init__(self, replicated_map, publish_interval=0.2, feed=None, heartbeat_interval=30):
+        self.replicated_map = replicated_map  # Non-blocking proxy, put_all must not block the event loop
+        self.publish_interval = publish_interval
+        self.feed = feed
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_at = time.monotonic()
+
+        self.quotes = {}  # symbol -> (QuoteRow, received_at)
+        self.changed = set()
+        self.updates = 0
+        self.published = 0
+
+    def update(self, rows):
+        received_at = time.time()
+        for row in rows:
+            current = self.quotes.get(row.symbol)
+            if current is None or row.timestamp >= current[0].timestamp:
+                self.quotes[row.symbol] = (row, received_at)
+                self.changed.add(row.symbol)
+                self.updates += 1
+
+    def publish(self):
+        heartbeat = time.monotonic() - self.heartbeat_at >= self.heartbeat_interval
+        if heartbeat:
+            self.heartbeat_at = time.monotonic()
+        elif not self.changed:
+            return
+        confirmed_at = time.time()
+        records = {symbol: quote_record(*self.quotes[symbol], confirmed_at)
+                   for symbol in (self.quotes if heartbeat else self.changed)}
+        changed, self.changed = self.changed, set()
+        if records:
+            self.replicated_map.put_all(
+                {symbol: json.dumps(record) for symbol, record in records.items()}).add_done_callback(self.on_published)
+        if self.feed is not None:
+            self.feed.publish('quote', [dict(records[symbol], symbol=symbol) for symbol in changed])
+        self.published += len(records)
+
+    @staticmethod
+    def on_published(future):
+        if future.exception() is not None:
+            logger.error(f"Error publishing latest quotes: {future.exception()}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Error publishing latest quotes: {e}")
+
+    def stats(self):
+        return {'symbols': len(self.quotes), 'updates': self.updates, 'published': self.published}
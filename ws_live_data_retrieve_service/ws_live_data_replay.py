@@ -0,0 +1,211 @@
+"""Record Bitmex websocket frames and replay them through CryptoSpotExchangeWsAsync.
+
+Recordings are gzip-compressed NDJSON, one line per frame: {"t": <seconds since start>, "frame": <raw message>}.
+Replay serves the frames from a local websocket server at 1x, Nx or max speed (--speed 0) into the unchanged
+subscribe_to_bitmex -> process_message -> repository path, with an in-memory repository instead of Cassandra,
+and reports frames/sec, rows/sec, per-stage latency percentiles and peak RSS.
+
+Examples:
+    python ws_live_data_replay.py record recorded_frames.ndjson.gz --duration 600
+    python ws_live_data_replay.py replay recorded_frames.ndjson.gz --speed 0 --write-latency 0.002
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import resource
+import sys
+import time
+from concurrent.futures import Future
+
+import ujson as json
+import websockets
+
+from ws_live_data_ingest_pipeline import LATENCY_STAGES
+from ws_live_data_quote_book import LatestQuoteBook
+from ws_live_data_update_feed import LiveUpdateFeed
+from ws_live_data_retrieve_service import CryptoSpotExchangeWsAsync
+
+BITMEX_URI = 'wss://ws.bitmex.com/realtime?subscribe=tradeBin1m,quote'
+
+
+class StaticConfig:
+    """Stand-in for ConsulServiceRegistry that serves config values from a dict."""
+
+    def __init__(self, config=None):
+        self.config = config or {}
+
+    def get_config(self, name):
+        value = self.config.get(name)
+        return str(value) if value is not None else None
+
+    def deregister_service(self):
+        pass
+
+
+class InMemoryReplicatedMap:
+    """Stand-in for the non-blocking Hazelcast ReplicatedMap proxy of the latest quote book."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def put_all(self, entries):
+        self.entries.update(entries)
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+class InMemoryTopic:
+    """Stand-in for the non-blocking Hazelcast topic proxy of the live update feed, only counts messages."""
+
+    def __init__(self):
+        self.messages = 0
+
+    def publish(self, message):
+        self.messages += 1
+        future = Future()
+        future.set_result(None)
+        return future
+
+
+class InMemoryWSLiveDataRetrieveRepository:
+    """Stand-in for WSLiveDataRetrieveRepository that only counts rows, with optional simulated write latency."""
+
+    def __init__(self, write_latency=0.0):
+        self.write_latency = write_latency
+        self.tradeBin1m_minutes = set()
+        self.rows = {'tradeBin1m': 0, 'quote': 0}
+
+    async def check_cassandra_minute_already_present(self, timestamp, symbol):
+        return (symbol, timestamp) in self.tradeBin1m_minutes
+
+    async def insert_cassandra_tradeBin1m(self, rows):
+        await self._write('tradeBin1m', rows)
+        self.tradeBin1m_minutes.update((row.symbol, row.timestamp) for row in rows)
+
+    async def insert_cassandra_quote(self, rows):
+        await self._write('quote', rows)
+
+    async def _write(self, table, rows):
+        if self.write_latency:
+            await asyncio.sleep(self.write_latency)
+        self.rows[table] += len(rows)
+
+
+def load_recording(path):
+    """Return a list of (seconds since start, raw frame); plain one-frame-per-line NDJSON is accepted too."""
+    opener = gzip.open if path.endswith('.gz') else open
+    recording = []
+    with opener(path, 'rt') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if 'frame' in record and 't' in record:
+                recording.append((record['t'], record['frame']))
+            else:
+                recording.append((0.0, line.rstrip('\n')))
+    return recording
+
+
+async def record(args):
+    start = time.monotonic()
+    frames = 0
+    with gzip.open(args.path, 'wt') as file:
+        async with websockets.connect(args.uri) as websocket:
+            while time.monotonic() - start < args.duration and (not args.frames or frames < args.frames):
+                message = await websocket.recv()
+                file.write(json.dumps({'t': round(time.monotonic() - start, 6), 'frame': message}) + '\n')
+                frames += 1
+    print(f"Recorded {frames} frames in {time.monotonic() - start:.1f} s to {args.path}")
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    if not samples:
+        return {point: 0.0 for point in points}
+    ordered = sorted(samples)
+    return {point: ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] for point in points}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+async def replay(args):
+    logging.getLogger().setLevel(args.log_level)
+    for name in ('ws_live_data_retrieve_service', 'ws_live_data_ingest_pipeline', 'websockets'):
+        logging.getLogger(name).setLevel(args.log_level)
+    recording = load_recording(args.path)
+
+    async def serve_frames(websocket, path=None):
+        start = time.monotonic()
+        for offset, frame in recording:
+            if args.speed:
+                delay = offset / args.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.send(frame)
+
+    config = StaticConfig({
+        'ingest/frame_queue_size': args.frame_queue_size,
+        'ingest/frame_overflow_policy': args.frame_overflow_policy,
+        'ingest/writer_concurrency': args.writer_concurrency,
+        'ingest/stats_interval': 0
+    })
+    repository = InMemoryWSLiveDataRetrieveRepository(write_latency=args.write_latency)
+
+    async with websockets.serve(serve_frames, 'localhost', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        service = CryptoSpotExchangeWsAsync(uri=f"ws://localhost:{port}", consul=config, repository=repository,
+                                            quote_book=LatestQuoteBook(InMemoryReplicatedMap()),
+                                            update_feed=LiveUpdateFeed(InMemoryTopic()),
+                                            latency_samples=len(recording) * 2)
+        await service.pipeline.start()
+        start = time.monotonic()
+        try:
+            await service.subscribe_to_bitmex()
+        except websockets.ConnectionClosed:
+            pass
+        await service.pipeline.join()
+        elapsed = time.monotonic() - start
+        stats = service.pipeline.stats()
+        latencies = service.pipeline.latencies
+        await service.pipeline.stop()
+
+    rows = sum(repository.rows.values())
+    print(f"Replayed {len(recording)} frames at {'max' if not args.speed else f'{args.speed}x'} speed in {elapsed:.2f} s")
+    print(f"  frames/sec: {len(recording) / elapsed:12.0f}")
+    print(f"  rows/sec:   {rows / elapsed:12.0f} ({repository.rows})")
+    print(f"  dropped:    {stats['frames']['dropped']} frames, "
+          f"{ {table: table_stats['dropped'] for table, table_stats in stats['tables'].items()} }")
+    print(f"  peak RSS:   {peak_rss_mb():12.1f} MB")
+    print("  latency (ms)       p50       p90       p99     p99.9")
+    for stage in LATENCY_STAGES:
+        values = percentiles(latencies[stage])
+        print(f"  {stage:<12}" + "".join(f"{values[point] * 1000:10.3f}" for point in values))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="Record Bitmex frames to a compressed NDJSON file")
+    record_parser.add_argument('path')
+    record_parser.add_argument('--uri', default=BITMEX_URI)
+    record_parser.add_argument('--duration', type=float, default=300, help="Seconds to record")
+    record_parser.add_argument('--frames', type=int, default=0, help="Stop after this many frames (0 - no limit)")
+
+    replay_parser = subparsers.add_parser('replay', help="Replay recorded frames through the ingest path")
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--speed', type=float, default=0, help="Playback speed multiplier (0 - max speed)")
+    replay_parser.add_argument('--write-latency', type=float, default=0.0, help="Simulated write latency, seconds")
+    replay_parser.add_argument('--frame-queue-size', type=int, default=10000)
+    replay_parser.add_argument('--frame-overflow-policy', default='block')
+    replay_parser.add_argument('--writer-concurrency', type=int, default=4)
+    replay_parser.add_argument('--log-level', default='WARNING', help="Log level of the ingest path during replay")
+
+    arguments = parser.parse_args()
+    asyncio.run(record(arguments) if arguments.command == 'record' else replay(arguments))
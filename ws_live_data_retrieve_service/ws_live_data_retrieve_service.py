@@ -1,12 +1,19 @@
 import asyncio
 import logging
+import os
 
-import pandas as pd
+import hazelcast
+from prometheus_client import start_http_server
 import ujson as json
 import websockets
 
+from bitmex_message_decoder import decode_tradeBin1m, decode_quote
+from ws_live_data_ingest_pipeline import IngestPipeline
+from ws_live_data_quote_book import LatestQuoteBook
+from ws_live_data_update_feed import LiveUpdateFeed
 from ws_live_data_retrieve_repository import WSLiveDataRetrieveRepository
 from consul_service_registry import ConsulServiceRegistry
+from service_metrics import CallbackMetric
 
 
 # Configure logging
@@ -15,14 +22,73 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
+def create_hazelcast_client(consul):
+    return hazelcast.HazelcastClient(
+        cluster_members=[consul.get_config("hazelcast/cluster_host")],
+        cluster_name=consul.get_config("hazelcast/cluster_name")
+    )
+
+
 class CryptoSpotExchangeWsAsync:
-    def __init__(self, uri='wss://ws.bitmex.com/realtime?subscribe=tradeBin1m,quote'):
-        self.consul = ConsulServiceRegistry(consul_host="consul-server", consul_port=8500)
-        self.repository = WSLiveDataRetrieveRepository(self.consul)
+    def __init__(self, uri='wss://ws.bitmex.com/realtime?subscribe=tradeBin1m,quote', consul=None, repository=None,
+                 quote_book=None, update_feed=None, hazelcast_client=None, latency_samples=0):
+        self.consul = consul or ConsulServiceRegistry(consul_host="consul-server", consul_port=8500)
+        self.repository = repository or WSLiveDataRetrieveRepository(self.consul)
+        # A client passed in is shared across reconnects; one created here is shut down when main() ends
+        self.client = hazelcast_client
+        self.owns_client = False
+        if self.client is None and (quote_book is None or update_feed is None):
+            self.client = create_hazelcast_client(self.consul)
+            self.owns_client = True
+        # Quotes and closed minute bars for the facade websocket clients
+        self.update_feed = update_feed or LiveUpdateFeed(
+            self.client.get_topic(self.consul.get_config("hazelcast/live_updates_topic") or "live_updates"))
+        self.quote_book = quote_book or LatestQuoteBook(
+            self.client.get_replicated_map(self.consul.get_config("hazelcast/latest_quotes_map") or "latest_quotes"),
+            publish_interval=float(self.consul.get_config("ingest/quote_publish_interval") or 0.2),
+            heartbeat_interval=float(self.consul.get_config("ingest/quote_heartbeat_interval") or 30),
+            feed=self.update_feed
+        )
         self.uri = uri
+        self.pipeline = IngestPipeline(
+            parse_frame=self.process_message,
+            frame_queue_size=int(self.consul.get_config("ingest/frame_queue_size") or 10000),
+            frame_overflow_policy=self.consul.get_config("ingest/frame_overflow_policy") or 'block',
+            write_queue_size=int(self.consul.get_config("ingest/write_queue_size") or 1000),
+            write_overflow_policies={
+                'tradeBin1m': self.consul.get_config("ingest/tradeBin1m_overflow_policy") or 'block',
+                'quote': self.consul.get_config("ingest/quote_overflow_policy") or 'drop_oldest'
+            },
+            writer_concurrency=int(self.consul.get_config("ingest/writer_concurrency") or 4),
+            stats_interval=int(self.consul.get_config("ingest/stats_interval") or 60),
+            latency_samples=latency_samples
+        )
+        # Frames already received when the websocket disconnects are still written before the next connection
+        self.drain_timeout = float(self.consul.get_config("ingest/drain_timeout") or 30)
+
+        CallbackMetric('ingest_queue_depth', "Items waiting in the ingest queues", self.queue_depths, ['queue'])
+        CallbackMetric('ingest_dropped_total', "Items dropped by the overflow policy of the ingest queues",
+                       self.queue_drops, ['queue'], type='counter')
+
+    def queue_depths(self):
+        stats = self.pipeline.stats()
+        return {('frames',): stats['frames']['depth'],
+                **{(table,): table_stats['depth'] for table, table_stats in stats['tables'].items()}}
 
-    async def process_message(self, message_raw):
-        logger.debug(message_raw)
+    def queue_drops(self):
+        stats = self.pipeline.stats()
+        return {('frames',): stats['frames']['dropped'],
+                **{(table,): table_stats['dropped'] for table, table_stats in stats['tables'].items()}}
+
+    async def insert_partial_tradeBin1m(self, rows):
+        if len(rows) > 0:
+            result = await self.repository.check_cassandra_minute_already_present(rows[0].timestamp, rows[0].symbol)
+            if result:
+                logger.info("Data already present in Cassandra.")
+                return
+        await self.repository.insert_cassandra_tradeBin1m(rows)
+
+    async def process_message(self, message_raw, received_at=None):
         message = json.loads(message_raw)
 
         table = message.get("table")
@@ -39,21 +105,24 @@ class CryptoSpotExchangeWsAsync:
                 data = message['data']
                 if action == 'partial':
                     if table == 'tradeBin1m':
-                        if len(data) > 0:
-                            timestamp = pd.Timestamp(data[0]['timestamp']).to_pydatetime()
-                            symbol = data[0]['symbol']
-                            result = await self.repository.check_cassandra_minute_already_present(timestamp, symbol)
-                            if result:
-                                logger.info("Data already present in Cassandra.")
-                                return
-                        await self.repository.insert_cassandra_tradeBin1m(data)
+                        rows = decode_tradeBin1m(data)
+                        await self.pipeline.submit(table, self.insert_partial_tradeBin1m, rows, received_at=received_at)
                     elif table == 'quote':
-                        await self.repository.insert_cassandra_quote(data)
+                        rows = decode_quote(data)
+                        # The book is updated before the write is queued, so it is current even if the write is dropped
+                        self.quote_book.update(rows)
+                        await self.pipeline.submit(table, self.repository.insert_cassandra_quote, rows, received_at=received_at)
                 elif action == 'insert':
                     if table == 'tradeBin1m':
-                        await self.repository.insert_cassandra_tradeBin1m(data)
+                        rows = decode_tradeBin1m(data)
+                        # Inserted bins are closed minutes
+                        self.update_feed.publish_tradeBin1m(rows)
+                        await self.pipeline.submit(table, self.repository.insert_cassandra_tradeBin1m, rows, received_at=received_at)
                     elif table == 'quote':
-                        await self.repository.insert_cassandra_quote(data)
+                        rows = decode_quote(data)
+                        # The book is updated before the write is queued, so it is current even if the write is dropped
+                        self.quote_book.update(rows)
+                        await self.pipeline.submit(table, self.repository.insert_cassandra_quote, rows, received_at=received_at)
 
         except Exception as err:
             logger.error(str(err))
@@ -62,19 +131,32 @@ class CryptoSpotExchangeWsAsync:
         async with websockets.connect(self.uri) as websocket:
             while True:
                 message = await websocket.recv()
-                processed = await self.process_message(message)
+                await self.pipeline.put_frame(message)
 
     async def main(self):
-        await self.subscribe_to_bitmex()
+        await self.pipeline.start()
+        quote_publisher = asyncio.create_task(self.quote_book.run())
+        try:
+            await self.subscribe_to_bitmex()
+        finally:
+            # No more frames are received; write the queued ones, then stop
+            await self.pipeline.stop(drain=True, timeout=self.drain_timeout)
+            quote_publisher.cancel()
+            if self.owns_client:
+                self.client.shutdown()
 
     def __del__(self):
         self.consul.deregister_service()
 
 
 if __name__ == "__main__":
+    start_http_server(int(os.environ.get("SERVICE_PORT") or 8003))
+    consul = ConsulServiceRegistry(consul_host="consul-server", consul_port=8500)
+    # One Hazelcast client for the whole process; only the websocket connection is re-created
+    hazelcast_client = create_hazelcast_client(consul)
     while True:
         try:
-            data_receive_service = CryptoSpotExchangeWsAsync()
+            data_receive_service = CryptoSpotExchangeWsAsync(consul=consul, hazelcast_client=hazelcast_client)
             asyncio.run(data_receive_service.main())
         except Exception as e:
             logger.error(e)
@@ -0,0 +1,41 @@
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+
+def to_milliseconds(timestamp):
+    return int(timestamp.timestamp() * 1000)
+
+
+def tradeBin1m_record(row):
+    """Closed minute bar of the live update feed; the timestamp is in epoch milliseconds."""
+    return dict(row._asdict(), timestamp=to_milliseconds(row.timestamp))
+
+
+class LiveUpdateFeed:
+    """Publishes quote and closed-minute tradeBin1m updates to one Hazelcast topic for the facade services.
+
+    A message is {"table": ..., "data": [record, ...]}, every record has a symbol; the facade fans it out to
+    the websocket clients subscribed to that symbol.
+    """
+
+    def __init__(self, topic):
+        self.topic = topic  # Non-blocking proxy, publish must not block the event loop
+        self.published = 0
+
+    def publish(self, table, records):
+        if not records:
+            return
+        self.topic.publish(json.dumps({'table': table, 'data': records})).add_done_callback(self.on_published)
+        self.published += len(records)
+
+    def publish_tradeBin1m(self, rows):
+        self.publish('tradeBin1m', [tradeBin1m_record(row) for row in rows])
+
+    @staticmethod
+    def on_published(future):
+        if future.exception() is not None:
+            logger.error(f"Error publishing live updates: {future.exception()}")
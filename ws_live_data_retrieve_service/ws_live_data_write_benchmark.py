@@ -0,0 +1,94 @@
+"""Compare rows/sec of the legacy logged-batch write path against CassandraWriteEngine modes.
+
+Writes synthetic tradeBin1m rows into a separate benchmark keyspace, so production data is untouched.
+
+Example:
+    python ws_live_data_write_benchmark.py --contact-point localhost --symbols 200 --minutes 60
+"""
+import argparse
+import asyncio
+import datetime
+import random
+import time
+
+from cassandra.auth import PlainTextAuthProvider
+from cassandra.cluster import Cluster
+from cassandra.query import BatchStatement
+
+from ws_live_data_write_engine import CassandraWriteEngine, WRITE_MODES, execute_async
+
+SCHEMA = [
+    "CREATE KEYSPACE IF NOT EXISTS {keyspace} WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}",
+    """CREATE TABLE IF NOT EXISTS {keyspace}.tradeBin1m (
+        timestamp TIMESTAMP, symbol TEXT, open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE, trades BIGINT,
+        volume DOUBLE, lastSize DOUBLE, turnover DOUBLE, homeNotional DOUBLE, foreignNotional DOUBLE,
+        PRIMARY KEY (symbol, timestamp))""",
+    """CREATE TABLE IF NOT EXISTS {keyspace}.quote (
+        timestamp TIMESTAMP, symbol TEXT, bidSize BIGINT, bidPrice DOUBLE, askPrice DOUBLE, askSize BIGINT,
+        PRIMARY KEY (symbol, timestamp))"""
+]
+
+
+def generate_frames(symbols, minutes):
+    """One frame per minute holding a tradeBin1m row for every symbol, like a Bitmex 'insert' message."""
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    frames = []
+    for minute in range(minutes):
+        timestamp = start + datetime.timedelta(minutes=minute)
+        frames.append([
+            (timestamp, f"SYM{i}USD", 1.0, 2.0, 0.5, 1.5, random.randint(0, 1000), 10.0, 1.0, 100.0,
+             random.random() * 10, random.random() * 1000)
+            for i in range(symbols)
+        ])
+    return frames
+
+
+async def legacy_write(session, frame):
+    batch = BatchStatement()
+    for row in frame:
+        query = "INSERT INTO tradeBin1m (timestamp, symbol, open, high, low, close, trades, volume, lastSize, turnover, homeNotional, foreignNotional) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        batch.add(query, row)
+    await execute_async(session, batch)
+
+
+async def run(session, frames, write_frame):
+    rows = sum(len(frame) for frame in frames)
+    session.execute("TRUNCATE tradeBin1m")
+    start = time.perf_counter()
+    for frame in frames:
+        await write_frame(frame)
+    elapsed = time.perf_counter() - start
+    return rows / elapsed, elapsed
+
+
+async def main(args):
+    auth_provider = PlainTextAuthProvider(username=args.username, password=args.password)
+    cluster = Cluster(contact_points=[args.contact_point], auth_provider=auth_provider, protocol_version=3)
+    session = cluster.connect()
+    for statement in SCHEMA:
+        session.execute(statement.format(keyspace=args.keyspace))
+    session.set_keyspace(args.keyspace)
+
+    frames = generate_frames(args.symbols, args.minutes)
+    results = {'legacy_logged_batch': await run(session, frames, lambda frame: legacy_write(session, frame))}
+    for mode in WRITE_MODES:
+        engine = CassandraWriteEngine(session, mode=mode, concurrency=args.concurrency)
+        results[mode] = await run(session, frames, engine.write_tradeBin1m)
+
+    print(f"{args.symbols} symbols x {args.minutes} minutes, concurrency {args.concurrency}")
+    for name, (rows_per_second, elapsed) in results.items():
+        print(f"{name:>20}: {rows_per_second:10.0f} rows/sec ({elapsed:.2f} s)")
+
+    cluster.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--contact-point', default='localhost')
+    parser.add_argument('--username', default='cassandra')
+    parser.add_argument('--password', default='cassandra')
+    parser.add_argument('--keyspace', default='crypto_project_benchmark')
+    parser.add_argument('--symbols', type=int, default=200)
+    parser.add_argument('--minutes', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=16)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+import asyncio
+import functools
+from collections import defaultdict
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType
+
+WRITE_MODES = ('unlogged_batch', 'concurrent')
+
+TRADEBIN1M_INSERT = "INSERT INTO tradeBin1m (timestamp, symbol, open, high, low, close, trades, volume, lastSize, turnover, homeNotional, foreignNotional) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+QUOTE_INSERT = "INSERT INTO quote (timestamp, symbol, bidSize, bidPrice, askPrice, askSize) VALUES (?, ?, ?, ?, ?, ?)"
+TRADEBIN1M_ROLLUP_INSERT = "INSERT INTO tradeBin1m_rollup (hour, timestamp, symbol, trades, volume, homeNotional, foreignNotional) VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+
+def to_rollup_row(row):
+    """tradeBin1m row -> tradeBin1m_rollup row, bucketed into the partition of its hour."""
+    return (row.timestamp.replace(minute=0, second=0, microsecond=0), row.timestamp, row.symbol, row.trades,
+            row.volume, row.homeNotional, row.foreignNotional)
+
+
+async def execute_async(session, query, parameters=None):
+    """Run the query with session.execute_async and await the result without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def set_result(result):
+        if not future.done():
+            future.set_result(result)
+
+    def set_exception(err):
+        if not future.done():
+            future.set_exception(err)
+
+    response_future = session.execute_async(query, parameters)
+    response_future.add_callbacks(
+        callback=lambda result: loop.call_soon_threadsafe(set_result, result),
+        errback=lambda err: loop.call_soon_threadsafe(set_exception, err)
+    )
+    return await future
+
+
+class CassandraWriteEngine:
+    """Partition-aware writer for tradeBin1m and quote rows using statements prepared once.
+
+    'unlogged_batch' - rows are grouped by symbol (the partition key) into UNLOGGED batches,
+                       so every batch touches a single partition
+    'concurrent'     - every row is a separate execution via execute_concurrent_with_args
+    In both modes at most `concurrency` requests are in flight.
+    """
+
+    def __init__(self, session, mode='unlogged_batch', concurrency=16, max_batch_size=100):
+        if mode not in WRITE_MODES:
+            raise ValueError(f"Invalid write mode: {mode}")
+        self.session = session
+        self.mode = mode
+        self.concurrency = concurrency
+        self.max_batch_size = max_batch_size
+
+        self.tradeBin1m_statement = session.prepare(TRADEBIN1M_INSERT)
+        self.quote_statement = session.prepare(QUOTE_INSERT)
+        self.tradeBin1m_rollup_statement = session.prepare(TRADEBIN1M_ROLLUP_INSERT)
+
+    async def write_tradeBin1m(self, rows):
+        await self.write(self.tradeBin1m_statement, rows)
+
+    async def write_tradeBin1m_rollup(self, rows):
+        # All symbols of a minute share one hour partition, so this is a single-partition batch
+        await self.write(self.tradeBin1m_rollup_statement, [to_rollup_row(row) for row in rows], partition_key_index=0)
+
+    async def write_quote(self, rows):
+        await self.write(self.quote_statement, rows)
+
+    async def write(self, statement, rows, partition_key_index=1):
+        if not rows:
+            return
+        if self.mode == 'concurrent':
+            await self.write_concurrent(statement, rows)
+        else:
+            await self.write_unlogged_batches(statement, rows, partition_key_index)
+
+    async def write_concurrent(self, statement, rows):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(
+            execute_concurrent_with_args, self.session, statement, rows,
+            concurrency=self.concurrency, raise_on_first_error=True
+        ))
+
+    async def write_unlogged_batches(self, statement, rows, partition_key_index=1):
+        partitions = defaultdict(list)
+        for row in rows:
+            partitions[row[partition_key_index]].append(row)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def execute_batch(partition_rows):
+            if len(partition_rows) == 1:
+                query, parameters = statement, partition_rows[0]
+            else:
+                query, parameters = BatchStatement(batch_type=BatchType.UNLOGGED), None
+                for row in partition_rows:
+                    query.add(statement, row)
+            async with semaphore:
+                await execute_async(self.session, query, parameters)
+
+        await asyncio.gather(*(
+            execute_batch(partition_rows[i:i + self.max_batch_size])
+            for partition_rows in partitions.values()
+            for i in range(0, len(partition_rows), self.max_batch_size)
+        ))